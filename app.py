@@ -1,23 +1,210 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
+import time
+_IMPORT_STARTED = time.perf_counter() # Cold-start measurement, see STARTUP
+from flask import Flask, render_template, jsonify, request, redirect, url_for, session, g, has_request_context, send_file, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from datetime import datetime
-import pandas as pd
-import openpyxl
+from xml.sax.saxutils import escape as xml_escape
 import os
-import time
-import traceback
+import sys
+import importlib
 import json
-
-import io
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session, send_file
+import logging
+import random
+from contextlib import contextmanager, nullcontext
+import threading
+import functools
+import atexit
+import re
+import zipfile
+import tempfile
+import gzip
+import hashlib
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import CancelledError, TimeoutError as FuturesTimeout
+from collections import OrderedDict, deque
+from bisect import bisect_left
+try: import fcntl
+except ImportError: fcntl = None # Windows: no flock, run a single worker there
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+class _LazyModule:
+    """Stands in for a heavy module and imports it on first use, so a cold start can take
+    requests (and pull the workbook from storage) before pandas/openpyxl have loaded."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+pd = _LazyModule('pandas')
+np = _LazyModule('numpy')
+openpyxl = _LazyModule('openpyxl')
+xl_cell = _LazyModule('openpyxl.utils.cell')
 
 app = Flask(__name__)
 
 app.secret_key = 'mini_project_secret_key'
 app.secret_key = 'mini_project_secret_key'
 
+# --- LOGGING & METRICS ---
+# Leveled logging instead of unconditional prints. DEBUG lines raised while serving a
+# request are kept only for a sample of requests (LOG_SAMPLE_RATE), so DEBUG can stay on
+# in production without flooding the logs.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.05'))
+# /metrics needs a logged-in session or, for scrapers, "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+class _SampledDebugFilter(logging.Filter):
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not has_request_context(): return True
+        return g.get('log_sampled', False)
+
+log = logging.getLogger('chitfund')
+if not log.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    _log_handler.addFilter(_SampledDebugFilter())
+    log.addHandler(_log_handler)
+    log.propagate = False
+log.setLevel(LOG_LEVEL)
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _escape_label(value):
+    # Label values in the text exposition format: backslash, double quote and line feed are escaped
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Metrics:
+    """Counters and histograms in Prometheus text format (no client library needed).
+    Labels are tuples of (name, value) pairs. Gauges are read from callbacks at scrape time."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {} # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self._gauges = []
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock: self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            hist = self._histograms.get((name, labels))
+            if hist is None: hist = self._histograms[(name, labels)] = [0] * (len(HISTOGRAM_BUCKETS) + 2)
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if value <= bound: hist[i] += 1
+            hist[-2] += 1
+            hist[-1] += value
+
+    def gauge(self, name, help_text, read, kind='gauge'):
+        """Value(s) read at scrape time: read() returns [(labels, value), ...]. kind='counter'
+        exposes a running total kept elsewhere."""
+        self.describe(name, kind, help_text)
+        self._gauges.append((name, read))
+
+    def render(self):
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs: return ''
+            return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+        samples = {}
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append(f"{name}{fmt_labels(labels)} {value}")
+        for (name, labels), hist in histograms.items():
+            lines = samples.setdefault(name, [])
+            for bound, count in zip(HISTOGRAM_BUCKETS, hist):
+                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {hist[-2]}")
+            lines.append(f"{name}_count{fmt_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_sum{fmt_labels(labels)} {hist[-1]:.6f}")
+        for name, read in self._gauges:
+            try: values = read()
+            except Exception as e:
+                log.warning(f"metrics gauge {name} failed: {e}")
+                continue
+            samples.setdefault(name, []).extend(f"{name}{fmt_labels(labels)} {value}" for labels, value in values)
+
+        out = []
+        for name in sorted(samples):
+            kind, help_text = self._help.get(name, ('untyped', ''))
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(samples[name])
+        return '\n'.join(out) + '\n'
+
+METRICS = Metrics()
+METRICS.describe('chitfund_request_seconds', 'histogram', 'Request latency by route.')
+METRICS.describe('chitfund_phase_seconds', 'histogram', 'Time spent per phase (workbook open, parse, save, ...).')
+METRICS.describe('chitfund_sync_upload_seconds', 'histogram', 'Background upload latency to cloud storage.')
+
+@contextmanager
+def timed(phase):
+    """Times a block: feeds the phase histogram and, inside a request, its Server-Timing header."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        METRICS.observe('chitfund_phase_seconds', elapsed, (('phase', phase),))
+        if has_request_context():
+            timings = g.setdefault('timings', {})
+            timings[phase] = timings.get(phase, 0) + elapsed
+
+class _TimedJSONProvider(DefaultJSONProvider):
+    # jsonify() goes through response(); timing dumps() would also count session cookies
+    def response(self, *args, **kwargs):
+        with timed('json'): return super().response(*args, **kwargs)
+
+app.json = _TimedJSONProvider(app)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.log_sampled = random.random() < LOG_SAMPLE_RATE
+
+@app.after_request
+def add_server_timing(resp):
+    # Registered first, so it runs after the other after_request hooks (compression included).
+    # For streamed bodies this covers the time to the first byte.
+    started = g.get('request_started')
+    if started is None: return resp
+    total = time.perf_counter() - started
+    timings = g.get('timings', {})
+    resp.headers['Server-Timing'] = ', '.join(
+        [f"{phase};dur={sec * 1000:.1f}" for phase, sec in timings.items()] + [f"total;dur={total * 1000:.1f}"])
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    METRICS.observe('chitfund_request_seconds', total,
+                    (('method', request.method), ('route', route), ('status', resp.status_code)))
+    return resp
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint. Open to logged-in users, or to METRICS_TOKEN's bearer."""
+    has_token = METRICS_TOKEN and request.headers.get('Authorization') == f"Bearer {METRICS_TOKEN}"
+    if not has_token and 'user' not in session:
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
 # --- CONFIGURATION (Start) ---
 # Detect environment
 IS_CLOUD_RUN = os.environ.get('K_SERVICE') is not None
+# Report pool workers (see CROSS-SHEET REPORT) import this module only to parse sheets:
+# they skip the process-wide startup work (hydration, seeding, prewarm)
+IS_POOL_WORKER = multiprocessing.current_process().name != 'MainProcess' # Set before the child imports anything
 HAS_SUPABASE = os.environ.get("SUPABASE_URL") is not None
 
 if IS_CLOUD_RUN:
@@ -29,82 +216,295 @@ else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     FILE_NAME = os.path.join(BASE_DIR, 'sample_gemini.xlsx')
 
-USE_CLOUD_STORAGE = HAS_SUPABASE
 BUCKET_NAME = os.environ.get("BUCKET_NAME", "chitfund-data")
+REMOTE_FILE = 'data.xlsx'
+# Per-sheet text snapshots next to the workbook (see SHEET TEXT SIDECARS); "" disables them
+SIDECAR_DIR = os.environ.get("SIDECAR_DIR", os.path.join(os.path.dirname(FILE_NAME), '.sheet_cache'))
+# STORAGE_BACKEND=local keeps the "remote" copy in LOCAL_STORAGE_DIR instead of Supabase (tests / offline dev)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase" if HAS_SUPABASE else "")
+SYNC_DEBOUNCE_SECONDS = float(os.environ.get("SYNC_DEBOUNCE_SECONDS", "2"))
+SYNC_MAX_DELAY_SECONDS = 15 # Upload at least this often while edits keep arriving
+SYNC_MAX_BACKOFF_SECONDS = 300
+
+# --- FILE SAFETY ---
+# Several gunicorn workers share the workbook and the payment files. Writers replace a file
+# in one step (temp file + fsync + rename), so a reader opening it sees either the old or
+# the new version and needs no lock. Writers exclude each other, across processes, with
+# flock on a lock file next to the data.
+def _fsync_dir(path):
+    if os.name != 'posix': return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """Yields a temp file next to path that replaces path once the block finishes without
+    error. The data and the rename are both fsynced."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        try: os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except OSError: os.chmod(tmp, 0o644) # New file; mkstemp creates it 0600
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    _fsync_dir(path)
+
+class FileLock:
+    """Reader/writer lock shared by all processes on the host (fcntl.flock on path).
+    Every acquisition opens its own descriptor, so threads of one process exclude each
+    other the same way separate processes do. Not reentrant. No-op without fcntl."""
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def _hold(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd) # Releases the lock
+
+    def shared(self): return self._hold(False)
+    def exclusive(self): return self._hold(True)
+
+WORKBOOK_FILE_LOCK = FileLock(FILE_NAME + '.lock')
 
 # --- CLOUD STORAGE HELPERS (SUPABASE) ---
+class SupabaseStorage:
+    """Supabase Storage bucket, with one client reused for every call."""
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _bucket(self):
+        with self._lock:
+            if self._client is None:
+                from supabase import create_client
+                url = os.environ.get("SUPABASE_URL")
+                key = os.environ.get("SUPABASE_KEY")
+                if not url or not key: raise RuntimeError("Supabase credentials missing.")
+                self._client = create_client(url, key)
+            return self._client.storage.from_(self.bucket)
+
+    def download(self, name):
+        return self._bucket().download(name)
+
+    def etag(self, name):
+        """MD5 of the stored object as Supabase lists it, or None if it isn't there."""
+        folder, _, base = name.rpartition('/')
+        for entry in self._bucket().list(folder, {'search': base}):
+            if entry.get('name') == base:
+                return ((entry.get('metadata') or {}).get('eTag') or '').strip('"') or None
+        return None
+
+    def upload(self, name, data):
+        bucket = self._bucket()
+        try:
+            # Standard py client usually supports file_options={"upsert": "true"}
+            bucket.upload(name, data, file_options={"upsert": "true"})
+        except Exception as e:
+            # Fallback: if upload fails (maybe file exists and upsert didn't work), try 'update'
+            log.warning(f"Upload failed ({e}), trying update...")
+            bucket.update(name, data, file_options={"upsert": "true"})
+
+class LocalStorage:
+    """Directory standing in for the Supabase bucket."""
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def download(self, name):
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path): return None
+        with open(path, 'rb') as f: return f.read()
+
+    def etag(self, name):
+        path = os.path.join(self.root, name)
+        return _file_md5(path) if os.path.exists(path) else None
+
+    def upload(self, name, data):
+        with atomic_write(os.path.join(self.root, name)) as f: f.write(data)
+
+if STORAGE_BACKEND == 'local':
+    STORAGE = LocalStorage(os.environ.get("LOCAL_STORAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_storage')))
+elif STORAGE_BACKEND == 'supabase':
+    STORAGE = SupabaseStorage(BUCKET_NAME)
+else:
+    STORAGE = None
+USE_CLOUD_STORAGE = STORAGE is not None
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''): digest.update(chunk)
+    return digest.hexdigest()
+
 def sync_down():
-    """Downloads the excel file from Supabase Storage if it exists."""
-    if not USE_CLOUD_STORAGE: return
-    try:
-        from supabase import create_client
-        url = os.environ.get("SUPABASE_URL")
-        key = os.environ.get("SUPABASE_KEY")
-        if not url or not key:
-            print("Supabase credentials missing.")
-            return
+    """Downloads the excel file from cloud storage, unless the local copy already has the
+    same content (MD5 against the stored object's ETag). Returns True if it downloaded;
+    storage errors propagate. Holds the workbook locks throughout, so when several workers
+    start together one of them downloads and the others find a matching copy."""
+    if not USE_CLOUD_STORAGE: return False
+    with WORKBOOK_LOCK, WORKBOOK_FILE_LOCK.exclusive():
+        if os.path.exists(FILE_NAME):
+            try: remote_etag = STORAGE.etag(REMOTE_FILE)
+            except Exception as e:
+                remote_etag = None
+                log.warning(f"Reading the remote ETag failed ({e}), downloading instead")
+            if remote_etag and remote_etag == _file_md5(FILE_NAME):
+                log.info(f"Local workbook matches {REMOTE_FILE}; download skipped.")
+                return False
 
-        supabase = create_client(url, key)
-        
         # Download file (returns bytes)
-        print(f"Downloading data.xlsx from bucket '{BUCKET_NAME}'...")
-        response = supabase.storage.from_(BUCKET_NAME).download('data.xlsx')
-        
+        log.info(f"Downloading {REMOTE_FILE} from bucket '{BUCKET_NAME}'...")
+        response = STORAGE.download(REMOTE_FILE)
+
         if response:
-            with open(FILE_NAME, 'wb') as f:
+            with atomic_write(FILE_NAME) as f:
                 f.write(response)
-            print("Download successful.")
-        else:
-            print("No remote file found.")
-            # If Cloud Run and no remote file, we might crash if we don't have a seed.
-            # But currently we assume seed is in bucket.
-            
-    except Exception as e:
-        print(f"Supabase Download Error: {e}")
-
-# Initial Sync
-if USE_CLOUD_STORAGE: sync_down()
-
-# Cloud Run Fallback: If /tmp/data.xlsx still doesn't exist (sync failed or new setup),
-# try to copy from local seed if available in container
-if IS_CLOUD_RUN and not os.path.exists(FILE_NAME):
+            log.info("Download successful.")
+            return True
+        # If Cloud Run and no remote file, we might crash if we don't have a seed.
+        # But currently we assume seed is in bucket.
+        log.warning("No remote file found.")
+    return False
+
+# Cloud Run Fallback: Until the download (see STARTUP) lands, /tmp/data.xlsx is served
+# from the local seed if available in container
+if IS_CLOUD_RUN and not IS_POOL_WORKER and not os.path.exists(FILE_NAME):
     local_seed = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_gemini.xlsx')
     if os.path.exists(local_seed):
-        print("Copying local seed to /tmp...")
-        import shutil
-        shutil.copy(local_seed, FILE_NAME)
+        log.info("Copying local seed to /tmp...")
+        with WORKBOOK_FILE_LOCK.exclusive(), atomic_write(FILE_NAME) as f, open(local_seed, 'rb') as seed:
+            shutil.copyfileobj(seed, f)
+
+class SyncWorker:
+    """Background uploader. Saves call request() and return immediately; the worker waits
+    for edits to settle, then uploads the file as it is at that moment, so a burst of
+    edits costs one upload. Failed uploads are retried with exponential backoff."""
+    def __init__(self, storage, debounce=SYNC_DEBOUNCE_SECONDS):
+        self.storage = storage
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._thread = None
+        self._dirty_since = None # First request not yet picked up by an upload
+        self._last_request = None
+        self._retry_at = 0
+        self._flush = False
+        self._uploading = False
+        self.state = {
+            'uploads': 0,
+            'failures': 0,
+            'coalesced': 0,
+            'last_success': None,
+            'last_error': None,
+            'last_duration_ms': None
+        }
+
+    def request(self):
+        with self._cond:
+            now = time.monotonic()
+            if self._dirty_since is None: self._dirty_since = now
+            else: self.state['coalesced'] += 1
+            self._last_request = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sync-worker', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            return dict(self.state,
+                        pending=self._dirty_since is not None,
+                        uploading=self._uploading,
+                        retry_in=max(0, round(self._retry_at - time.monotonic(), 1)) if self._retry_at else None)
+
+    def flush(self, timeout=30):
+        """Uploads pending changes now and waits (up to timeout). Returns True once nothing is pending."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush = True
+            self._cond.notify_all()
+            while self._dirty_since is not None or self._uploading:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return False
+                self._cond.wait(remaining)
+        return True
+
+    def _due(self):
+        # Debounce: wait for a quiet period, but never longer than SYNC_MAX_DELAY_SECONDS,
+        # and not before the backoff of a failed upload has passed
+        if self._flush: return 0
+        due = min(self._last_request + self.debounce, self._dirty_since + SYNC_MAX_DELAY_SECONDS)
+        return max(due, self._retry_at)
+
+    def _run(self):
+        backoff = 1
+        while True:
+            with self._cond:
+                while self._dirty_since is None: self._cond.wait()
+                while self._dirty_since is not None and time.monotonic() < self._due():
+                    self._cond.wait(self._due() - time.monotonic())
+                self._dirty_since = self._last_request = None
+                self._uploading = True
+
+            started = time.monotonic()
+            error = None
+            try:
+                with open(FILE_NAME, 'rb') as f: data = f.read()
+                log.info(f"Uploading {REMOTE_FILE} to bucket '{BUCKET_NAME}'...")
+                self.storage.upload(REMOTE_FILE, data)
+                log.info("Upload successful.")
+            except Exception as e:
+                error = e
+                log.error(f"Supabase Upload/Update Error: {e}")
+
+            elapsed = time.monotonic() - started
+            METRICS.observe('chitfund_sync_upload_seconds', elapsed, (('result', 'ok' if error is None else 'error'),))
+            with self._cond:
+                self._uploading = False
+                self.state['last_duration_ms'] = round(elapsed * 1000, 1)
+                if error is None:
+                    backoff = 1
+                    self._retry_at = 0
+                    self.state['uploads'] += 1
+                    self.state['last_success'] = datetime.now().isoformat(timespec='seconds')
+                    if self._dirty_since is None: self._flush = False
+                else:
+                    self.state['failures'] += 1
+                    self.state['last_error'] = str(error)
+                    self._retry_at = time.monotonic() + backoff
+                    backoff = min(backoff * 2, SYNC_MAX_BACKOFF_SECONDS)
+                    if self._dirty_since is None: self._dirty_since = self._last_request = time.monotonic()
+                    self._flush = False
+                self._cond.notify_all()
+
+SYNC_WORKER = SyncWorker(STORAGE) if USE_CLOUD_STORAGE else None
+if SYNC_WORKER: atexit.register(SYNC_WORKER.flush, 10)
 
 def sync_up():
-    """Uploads the local excel file to Supabase Storage."""
+    """Schedules an upload of the local excel file (coalesced, in the background)."""
     if not USE_CLOUD_STORAGE: return
-    try:
-        from supabase import create_client
-        url = os.environ.get("SUPABASE_URL")
-        key = os.environ.get("SUPABASE_KEY")
-        if not url or not key: return
-
-        supabase = create_client(url, key)
-        
-        print(f"Uploading data.xlsx to bucket '{BUCKET_NAME}'...")
-        with open(FILE_NAME, 'rb') as f:
-            # Upsert is handled via file_options in some versions, or explicit 'upload' with overwriting behavior
-            # supabase-py storage upload signature varies. safer to try upload, if fail try update (or use upsert option)
-            # Standard py client usually supports file_options={"upsert": "true"}
-            supabase.storage.from_(BUCKET_NAME).upload('data.xlsx', f, file_options={"upsert": "true"})
-            
-        print("Upload successful.")
-    except Exception as e:
-        # Fallback: if upload fails (maybe file exists and upsert didn't work), try 'update'
-        try:
-           print(f"Upload failed ({e}), trying update...")
-           with open(FILE_NAME, 'rb') as f:
-               supabase.storage.from_(BUCKET_NAME).update('data.xlsx', f, file_options={"upsert": "true"})
-           print("Update successful.")
-        except Exception as e2:
-           print(f"Supabase Upload/Update Error: {e2}")
+    with timed('sync'): SYNC_WORKER.request()
 
-# Initial Sync
-if USE_CLOUD_STORAGE: sync_down()
+if SYNC_WORKER:
+    METRICS.gauge('chitfund_sync_uploads_total', 'Successful background uploads.',
+                  lambda: [((), SYNC_WORKER.state['uploads'])], kind='counter')
+    METRICS.gauge('chitfund_sync_failures_total', 'Failed background uploads.',
+                  lambda: [((), SYNC_WORKER.state['failures'])], kind='counter')
+    METRICS.gauge('chitfund_sync_pending', '1 while a change is waiting to be uploaded.',
+                  lambda: [((), int(SYNC_WORKER.status()['pending']))])
 
 # --- UTILS ---
 def clean_num(val):
@@ -124,37 +524,920 @@ def normalize_text(text):
     return str(text).lower().replace('.', '').replace(' ', '').replace(':', '').strip()
 
 # --- PAYMENT RECORDS DB HANDLER ---
+# payment_records.json is the compacted snapshot (same {item_id: paid_on} format as before),
+# payment_records.log holds one JSON line per toggle made since that snapshot.
 PAID_DB_FILE = 'payment_records.json'
+PAID_LOG_FILE = 'payment_records.log'
+PAID_LOCK_FILE = 'payment_records.lock'
+PAID_LOG_COMPACT_AFTER = 500 # Journal records before a background compaction
+
+class PaymentStore:
+    """In-memory {item_id: paid_on} index backed by a JSON snapshot plus an append-only journal.
+
+    A toggle appends one small record and updates the dict, so its cost does not grow
+    with the number of payments. Records are absolute ({"id", "paid"}, or {"ids", "paid"}
+    for a batch), so replaying the journal on top of any snapshot is idempotent.
+
+    The files can be shared by several processes. Appends and compactions hold an
+    exclusive file lock; refresh() tails the journal for records other processes wrote,
+    which costs one stat when there are none and takes no file lock.
+    """
+    def __init__(self, snapshot_path, log_path, lock_path=PAID_LOCK_FILE, compact_after=PAID_LOG_COMPACT_AFTER):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.compact_after = compact_after
+        self._file_lock = FileLock(lock_path)
+        self._lock = threading.Lock()
+        self._records = {}
+        self._log_records = 0
+        self._journal = (None, 0) # (inode, bytes applied) of the journal file
+        self._snapshot_mtime = 0
+        self._compacting = False
+        self.version = 0 # Changes seen by this process
+        self.listeners = [] # fn({item_id: paid_on}, version), called in order under the store lock
+        with timed('payments_load'), self._file_lock.shared():
+            open(self.log_path, 'a').close()
+            self._load()
+
+    def _load(self):
+        # Caller holds the file lock, so a compaction can't swap the files halfway through
+        records = {}
+        self._snapshot_mtime = 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    self._snapshot_mtime = os.fstat(f.fileno()).st_mtime_ns
+                    records = json.load(f)
+            except Exception as e:
+                log.error(f"Reading {self.snapshot_path} failed: {e}")
+        self._records = records
+        self._log_records = 0
+        self._journal = (None, 0)
+        self._tail(notify=False)
+
+    def _apply_lines(self, data):
+        """Applies journal lines; returns the resulting {item_id: paid_on} changes."""
+        changes = {}
+        for line in data.splitlines():
+            try: rec = json.loads(line)
+            except ValueError: continue # Torn write (a batch is one line, so all or nothing)
+            for item_id in rec['ids'] if 'ids' in rec else (rec['id'],):
+                self._apply(item_id, rec.get('paid'))
+                changes[item_id] = rec.get('paid')
+            self._log_records += 1
+        return changes
+
+    def _tail(self, notify=True):
+        """Applies journal records appended since the last read. Returns False when the
+        journal was replaced (compacted by another process) and a full reload is needed."""
+        try: f = open(self.log_path, 'rb')
+        except FileNotFoundError: return False
+        with f:
+            st = os.fstat(f.fileno())
+            inode, offset = self._journal
+            if inode is None: inode = st.st_ino
+            if st.st_ino != inode or st.st_size < offset: return False
+            f.seek(offset)
+            data = f.read()
+        # A record still being written (no newline yet) is picked up by the next read
+        end = data.rfind(b'\n') + 1
+        self._journal = (inode, offset + end)
+        changes = self._apply_lines(data[:end])
+        if changes and notify:
+            self.version += 1
+            for listener in self.listeners: listener(changes, self.version)
+        return True
+
+    def _refresh(self, locked=False):
+        # Caller holds self._lock; locked=True when it also holds the exclusive file lock
+        inode, offset = self._journal
+        try: st = os.stat(self.log_path)
+        except OSError: st = None
+        if st is not None and st.st_ino == inode and st.st_size == offset: return
+        if self._tail(): return
+        old = self._records
+        with (nullcontext() if locked else self._file_lock.shared()): self._load()
+        if self._records != old: self.version += 1
+
+    def refresh(self):
+        """Catches up with records written by other processes."""
+        with self._lock: self._refresh()
+
+    def _apply(self, item_id, paid_on):
+        if paid_on: self._records[item_id] = paid_on
+        else: self._records.pop(item_id, None)
+
+    def get(self, item_id):
+        return self._records.get(item_id)
+
+    def snapshot(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._records)
+
+    def versioned_snapshot(self):
+        """(version, records) taken together, for work keyed by the payment version."""
+        with self._lock:
+            self._refresh()
+            return self.version, dict(self._records)
+
+    def token(self):
+        """Names the current contents the same way in every process (used in ETags)."""
+        with self._lock:
+            self._refresh()
+            inode, offset = self._journal
+            return f"{self._snapshot_mtime:x}.{inode or 0:x}.{offset:x}"
+
+    def set(self, item_id, paid_on):
+        """Marks item_id paid on paid_on (or unpaid when paid_on is None)."""
+        with self._lock, self._file_lock.exclusive():
+            self._refresh(locked=True)
+            self._append([item_id], paid_on)
+
+    def set_many(self, item_ids, paid_on):
+        """Marks every item paid on paid_on (or unpaid), in one journal record and one fsync.
+        Items already in that state are left alone, so earlier payment dates survive.
+        Returns the ids that changed."""
+        with self._lock, self._file_lock.exclusive():
+            self._refresh(locked=True)
+            changed = [i for i in dict.fromkeys(item_ids) if bool(self._records.get(i)) != bool(paid_on)]
+            if changed: self._append(changed, paid_on)
+        return changed
+
+    def toggle(self, item_id, paid_on):
+        """Flips item_id between unpaid and paid_on. Returns the new value (None = unpaid)."""
+        with self._lock, self._file_lock.exclusive():
+            self._refresh(locked=True)
+            new_value = None if self._records.get(item_id) else paid_on
+            self._append([item_id], new_value)
+        return new_value
+
+    def _append(self, item_ids, paid_on):
+        # Caller holds self._lock and the exclusive file lock, and has just refreshed
+        rec = {'id': item_ids[0], 'paid': paid_on} if len(item_ids) == 1 else {'ids': item_ids, 'paid': paid_on}
+        record = (json.dumps(rec) + '\n').encode()
+        with open(self.log_path, 'ab') as f:
+            st = os.fstat(f.fileno())
+            # Start on a fresh line if a crash left half a record behind
+            if st.st_size > self._journal[1]: record = b'\n' + record
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal = (st.st_ino, st.st_size + len(record))
+        for item_id in item_ids: self._apply(item_id, paid_on)
+        self.version += 1
+        self._log_records += 1
+        changes = dict.fromkeys(item_ids, paid_on)
+        for listener in self.listeners: listener(changes, self.version)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._compacting or self._log_records < self.compact_after: return
+        self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Folds the journal into the snapshot. Toggles keep appending while the snapshot is
+        written; those records are carried over into the new journal."""
+        tmp = f"{self.snapshot_path}.tmp{os.getpid()}" # Workers may compact at the same time
+        try:
+            with self._lock, self._file_lock.exclusive():
+                self._refresh(locked=True)
+                data = dict(self._records)
+                inode, offset = self._journal
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._lock, self._file_lock.exclusive():
+                self._refresh(locked=True)
+                if self._journal[0] != inode: return # Another process compacted meanwhile
+                with open(self.log_path, 'rb') as f:
+                    f.seek(offset)
+                    rest = f.read()
+                rest = rest[:rest.rfind(b'\n') + 1]
+                os.replace(tmp, self.snapshot_path)
+                with atomic_write(self.log_path) as f: f.write(rest)
+                self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime_ns
+                self._journal = (os.stat(self.log_path).st_ino, len(rest))
+                self._log_records = rest.count(b'\n')
+        except Exception as e:
+            log.error(f"Compacting payment journal failed: {e}")
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+            self._compacting = False
+
+PAYMENTS = PaymentStore(PAID_DB_FILE, PAID_LOG_FILE)
+
+def paid_db_version():
+    """Identifies the current payment DB contents in this process (used in cache keys)."""
+    PAYMENTS.refresh()
+    return PAYMENTS.version
+
+def paid_db_token():
+    """Like paid_db_version(), but the same in every worker and across restarts (used in ETags)."""
+    return PAYMENTS.token()
+
+# --- LEDGER MODEL ---
+# Parsed sheets live in LEDGER_CACHE and back every request, so members and items are
+# slotted objects instead of dicts, repeated strings (areas, months, plans) are interned,
+# and member totals are kept current as items are added. Responses turn them into plain
+# dicts (to_dict()) at the very end.
+MEMBER_FIELDS = ('name', 'area', 'total', 'paid_amount', 'is_paid', 'paid_date', 'payment_id', 'key', 'items')
+
+class LedgerItem:
+    __slots__ = ('month', 'plan', 'commission', 'amount', 'id', 'is_paid', 'paid_date')
+
+    def __init__(self, month, plan, commission, amount, item_id, paid_on):
+        self.month = month
+        self.plan = plan
+        self.commission = commission
+        self.amount = amount
+        self.id = item_id
+        self.is_paid = bool(paid_on)
+        self.paid_date = paid_on if isinstance(paid_on, str) and paid_on else None
+
+    def with_paid(self, paid_on):
+        return LedgerItem(self.month, self.plan, self.commission, self.amount, self.id, paid_on)
+
+    def to_dict(self):
+        return {'month': self.month, 'plan': self.plan, 'commission': self.commission, 'amount': self.amount,
+                'id': self.id, 'is_paid': self.is_paid, 'paid_date': self.paid_date}
+
+class LedgerMember:
+    """A member's items with running total / paid_amount. key is the normalized name_area
+    that identifies the member across sheets."""
+    __slots__ = ('name', 'area', 'key', 'norm_name', 'items', 'total', 'paid_amount')
+    paid_date = None # Members carry no date of their own (kept for the JSON shape)
+
+    def __init__(self, name, area, key, norm_name):
+        self.name = name
+        self.area = area
+        self.key = key
+        self.norm_name = norm_name
+        self.items = []
+        self.total = 0
+        self.paid_amount = 0
+
+    def add(self, item):
+        self.items.append(item)
+        self.total += item.amount
+        if item.is_paid: self.paid_amount += item.amount
+
+    @property
+    def is_paid(self):
+        return self.total > 0 and self.paid_amount >= self.total
+
+    @property
+    def payment_id(self):
+        # Legacy member-level id: name + sum of item amounts
+        return f"{self.name}_{int(self.total)}".replace(" ", "")
+
+    def with_payments(self, changes):
+        """Copy with the payment status of the items in changes ({item_id: paid_on}) replaced."""
+        member = LedgerMember(self.name, self.area, self.key, self.norm_name)
+        for item in self.items: member.add(item.with_paid(changes[item.id]) if item.id in changes else item)
+        return member
+
+    def field(self, name):
+        if name == 'items': return [item.to_dict() for item in self.items]
+        return getattr(self, name)
+
+    def to_dict(self, fields=MEMBER_FIELDS):
+        return {f: self.field(f) for f in fields}
+
+MEMBER_STATUSES = ('paid', 'partial', 'pending')
+MEMBER_SORTS = ('name', 'area', 'due', 'progress')
+
+def member_status(member):
+    if member.is_paid: return 'paid'
+    return 'partial' if member.paid_amount > 0 else 'pending'
+
+def _bit_positions(bits):
+    """Set bit numbers of bits, ascending."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+class MemberIndex:
+    """Search index over a sheet's members, built with the ledger. Names and areas don't
+    change with payments, so one index is shared by every payment-patched copy.
+
+    Positions (in members) are kept as int bitmaps, so filters combine with & and |.
+    tokens is a sorted list of (normalized word, bitmap) for prefix lookups by bisection:
+    every word of the name and area, plus the whole normalized name and area."""
+    __slots__ = ('tokens', 'keys', 'areas', 'area_names', 'area_order')
+
+    def __init__(self, members):
+        words, areas = {}, {}
+        for pos, m in enumerate(members):
+            bit = 1 << pos
+            norm_area = normalize_text(m.area)
+            for word in set(str(m.name).split() + str(m.area).split()) | {m.norm_name, norm_area}:
+                word = normalize_text(word)
+                if word: words[word] = words.get(word, 0) | bit
+            if norm_area not in areas: areas[norm_area] = [m.area, 0]
+            areas[norm_area][1] |= bit
+        self.tokens = sorted(words.items())
+        self.keys = [word for word, _ in self.tokens]
+        self.areas = {norm: bits for norm, (_, bits) in areas.items()}
+        self.area_names = sorted(name for name, _ in areas.values())
+        self.area_order = sorted(range(len(members)), key=lambda pos: (normalize_text(members[pos].area), members[pos].name))
+
+    def prefix(self, word):
+        """Bitmap of the members with a name or area word starting with word."""
+        bits = 0
+        for i in range(bisect_left(self.keys, word), len(self.keys)):
+            if not self.keys[i].startswith(word): break
+            bits |= self.tokens[i][1]
+        return bits
+
+SUMMARY_COUNTERS = ('members', 'total', 'collected') + tuple(
+    f"{status}_{what}" for status in MEMBER_STATUSES for what in ('count', 'amount'))
+
+class SheetSummary:
+    """Materialized totals of a sheet and of each area in it: member count, total, amount
+    collected and, per payment status, how many members and how much of the total.
+
+    Members with nothing due (total <= 0) are counted but left out of the amounts and
+    statuses, as on the reports page. Payments only move amounts between members'
+    rollups, so payment-patched copies are updated member by member (with_members()); the
+    summary is rebuilt only when the sheet itself is parsed again."""
+    __slots__ = ('grand_total', 'sheet', 'areas')
+
+    def __init__(self, members, grand_total):
+        self.grand_total = grand_total
+        self.sheet = dict.fromkeys(SUMMARY_COUNTERS, 0)
+        self.areas = {} # normalized area -> [display name, counters]
+        for m in members: self._add(m, 1)
+
+    def _add(self, member, sign):
+        area = self.areas.get(normalize_text(member.area))
+        if area is None: area = self.areas[normalize_text(member.area)] = [member.area, dict.fromkeys(SUMMARY_COUNTERS, 0)]
+        for counters in (self.sheet, area[1]):
+            counters['members'] += sign
+            if member.total <= 0: continue
+            status = member_status(member)
+            counters['total'] += sign * member.total
+            counters['collected'] += sign * member.paid_amount
+            counters[f"{status}_count"] += sign
+            counters[f"{status}_amount"] += sign * member.total
+
+    def with_members(self, changed):
+        """Copy with each (old, new) member pair in changed swapped in the rollups."""
+        summary = SheetSummary.__new__(SheetSummary)
+        summary.grand_total = self.grand_total
+        summary.sheet = dict(self.sheet)
+        summary.areas = dict(self.areas)
+        for old, new in changed:
+            key = normalize_text(old.area)
+            if summary.areas[key] is self.areas[key]: # Copy each touched area once
+                summary.areas[key] = [self.areas[key][0], dict(self.areas[key][1])]
+            summary._add(old, -1)
+            summary._add(new, 1)
+        return summary
+
+    @staticmethod
+    def _counters(counters):
+        out = {'members': counters['members'],
+               'total': round(counters['total'], 2),
+               'collected': round(counters['collected'], 2),
+               'pending': round(counters['total'] - counters['collected'], 2),
+               'paid_pct': _pct(counters['collected'], counters['total'])}
+        for status in MEMBER_STATUSES:
+            out[status] = {'count': counters[f"{status}_count"], 'amount': round(counters[f"{status}_amount"], 2)}
+        return out
+
+    def to_dict(self, calculated_total):
+        return dict(self._counters(self.sheet),
+                    grand_total=self.grand_total,
+                    calculated_total=calculated_total,
+                    difference=round(self.grand_total - calculated_total, 2),
+                    areas=[dict(self._counters(counters), area=name)
+                           for name, counters in sorted(self.areas.values(), key=lambda a: str(a[0]))])
+
+class ParsedLedger:
+    """One parsed sheet: members sorted by name, the sheet totals, an item_id -> member index,
+    the search index, one bitmap of member positions per payment status and the summary."""
+    __slots__ = ('members', 'grand_total', 'calculated_total', 'item_index', 'index', 'status_bits', 'summary')
+
+    def __init__(self, members, grand_total, calculated_total, item_index, index=None, status_bits=None, summary=None):
+        self.members = members
+        self.grand_total = grand_total
+        self.calculated_total = calculated_total
+        self.item_index = item_index # item_id -> positions in members
+        self.index = index or MemberIndex(members)
+        if status_bits is None:
+            status_bits = dict.fromkeys(MEMBER_STATUSES, 0)
+            for pos, m in enumerate(members): status_bits[member_status(m)] |= 1 << pos
+        self.status_bits = status_bits
+        self.summary = summary or SheetSummary(members, grand_total)
+
+    def positions_for(self, item_ids):
+        """Positions (in members) of the members holding any of item_ids, in order."""
+        return sorted({pos for item_id in item_ids for pos in self.item_index.get(item_id, ())})
+
+    def members_for(self, item_id):
+        return [self.members[pos] for pos in self.positions_for((item_id,))]
+
+    def with_payments(self, changes):
+        """Copy with payment statuses changed ({item_id: paid_on}); only the affected members are rebuilt."""
+        positions = self.positions_for(changes)
+        if not positions: return self
+        members = list(self.members)
+        status_bits = dict(self.status_bits)
+        for pos in positions:
+            before = member_status(members[pos])
+            members[pos] = members[pos].with_payments(changes)
+            after = member_status(members[pos])
+            if after != before:
+                status_bits[before] &= ~(1 << pos)
+                status_bits[after] |= 1 << pos
+        summary = self.summary.with_members([(self.members[pos], members[pos]) for pos in positions])
+        return ParsedLedger(members, self.grand_total, self.calculated_total, self.item_index, self.index, status_bits, summary)
+
+    def search(self, query=None, area=None, status=None, sort='name'):
+        """Positions of the members matching every word of query (as a prefix of a name or
+        area word), the area and the status, in sort order."""
+        bits = (1 << len(self.members)) - 1
+        for word in str(query or '').split():
+            bits &= self.index.prefix(normalize_text(word))
+        if area: bits &= self.index.areas.get(normalize_text(area), 0)
+        if status: bits &= self.status_bits[status]
+        if sort == 'area': return [pos for pos in self.index.area_order if bits >> pos & 1]
+        positions = list(_bit_positions(bits))
+        if sort == 'due':
+            positions.sort(key=lambda pos: self.members[pos].paid_amount - self.members[pos].total)
+        elif sort == 'progress': # Least collected first, as the members page lists them
+            positions.sort(key=lambda pos: self.members[pos].paid_amount / self.members[pos].total if self.members[pos].total > 0 else 1)
+        return positions
+
+    def to_dict(self, fields=MEMBER_FIELDS, columns=False, positions=None):
+        """The get_excel_data() structure. fields limits what each member carries;
+        columns=True turns the member list into {field: [values...]}; positions limits
+        (and orders) the members included."""
+        selected = self.members if positions is None else [self.members[pos] for pos in positions]
+        if columns: members = {f: [m.field(f) for m in selected] for f in fields}
+        else: members = [m.to_dict(fields) for m in selected]
+        return {'members': members, 'grand_total': self.grand_total, 'calculated_total': self.calculated_total}
+
+# --- PARSED LEDGER CACHE ---
+def workbook_version():
+    """(mtime, size, inode) of the workbook, or None if it does not exist. Every save
+    renames a new file into place, so the inode changes even when mtime and size don't."""
+    try: st = os.stat(FILE_NAME)
+    except OSError: return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def workbook_token():
+    """workbook_version() as an opaque string for clients (optimistic concurrency)."""
+    version = workbook_version()
+    return '-'.join(f"{part:x}" for part in version) if version else ""
+
+WORKBOOK_LOCK = threading.RLock()
+WORKBOOK_READY = threading.Event() # Set once the startup download has finished (see STARTUP)
+_workbook_lock_depth = 0 # Nesting of workbook_write_lock() in the thread holding WORKBOOK_LOCK
+
+@contextmanager
+def workbook_write_lock():
+    """Holds the workbook for a read-modify-write: WORKBOOK_LOCK against this process's
+    threads and WORKBOOK_FILE_LOCK against other workers. Reentrant. Waits for the startup
+    download first, so an edit is never made to the seed and then overwritten."""
+    global _workbook_lock_depth
+    WORKBOOK_READY.wait()
+    with WORKBOOK_LOCK:
+        with (WORKBOOK_FILE_LOCK.exclusive() if _workbook_lock_depth == 0 else nullcontext()):
+            _workbook_lock_depth += 1
+            try: yield
+            finally: _workbook_lock_depth -= 1
+
+def workbook_writer(fn):
+    """Runs a route under workbook_write_lock(), so writes to the workbook never interleave.
+    Unauthenticated requests are turned away before they queue for the lock."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+        with workbook_write_lock(): return fn(*args, **kwargs)
+    return wrapper
+
+def save_workbook(wb):
+    """Saves wb over the live workbook in one atomic step."""
+    with timed('save'), atomic_write(FILE_NAME) as f: wb.save(f)
+
+class _Flight:
+    """One in-progress load that concurrent callers wait on."""
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class LedgerCache:
+    """Bounded LRU of parsed sheets keyed by (sheet fingerprint, sheet, payment DB version).
+
+    The fingerprint covers just that sheet's content, so writing one month leaves the
+    parsed copies of every other month valid.
+
+    Concurrent misses for the same key share a single load: the first caller
+    parses, the rest block until it finishes and receive the same result.
+    Cached values are shared between requests and must be treated as read-only.
+    """
+    def __init__(self, max_entries=48):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._generation = 0 # Bumped by invalidate() so loads started before a write aren't stored
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None: raise flight.error
+            return flight.value
 
-def load_paid_db():
-    if not os.path.exists(PAID_DB_FILE): return {}
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and generation == self._generation:
+                    self._entries[key] = flight.value
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.event.set()
+        return flight.value
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def peek(self, key):
+        """Cached value for key or None; never loads."""
+        with self._lock:
+            if key not in self._entries: return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def store(self, key, value, generation):
+        """Adds a value loaded elsewhere, unless a write happened since generation was read."""
+        with self._lock:
+            if generation != self._generation: return
+            self.misses += 1
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, sheet_name=None):
+        """Drops entries for one sheet, or everything when sheet_name is None."""
+        with self._lock:
+            self._generation += 1
+            if sheet_name is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[1] == sheet_name]:
+                del self._entries[key]
+
+    def apply_payment(self, changes, version):
+        """Moves entries from payment version-1 to version by patching the changed items
+        ({item_id: paid_on}) in place of a re-parse. Entries further behind can't be
+        patched and are dropped."""
+        with self._lock:
+            self._generation += 1
+            entries = OrderedDict()
+            for (fingerprint, sheet_name, paid_version), ledger in self._entries.items():
+                if paid_version == version - 1:
+                    entries[(fingerprint, sheet_name, version)] = ledger.with_payments(changes)
+            self._entries = entries
+
+LEDGER_CACHE = LedgerCache()
+PAYMENTS.listeners.append(LEDGER_CACHE.apply_payment)
+
+METRICS.gauge('chitfund_ledger_cache_hits_total', 'Parsed-sheet cache hits.', lambda: [((), LEDGER_CACHE.hits)], kind='counter')
+METRICS.gauge('chitfund_ledger_cache_misses_total', 'Parsed-sheet cache misses.', lambda: [((), LEDGER_CACHE.misses)], kind='counter')
+METRICS.gauge('chitfund_ledger_cache_hit_ratio', 'Parsed-sheet cache hits / lookups since start.',
+              lambda: [((), round(LEDGER_CACHE.hits / max(LEDGER_CACHE.hits + LEDGER_CACHE.misses, 1), 4))])
+METRICS.gauge('chitfund_payments_version', 'Payment changes seen by this worker since start.', lambda: [((), PAYMENTS.version)])
+
+# --- WORKBOOK METADATA INDEX ---
+# Sheet names/order come from xl/workbook.xml and dimensions from the <dimension> tag at
+# the head of each sheet part, so listing sheets never loads the workbook itself.
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([^"]+)"')
+_workbook_meta = None
+_workbook_meta_lock = threading.Lock()
+
+def _xml_local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _read_sheet_dimension(zf, part):
+    """Reads just enough of a worksheet part to find its <dimension ref=...>."""
     try:
-        with open(PAID_DB_FILE, 'r') as f: return json.load(f)
-    except: return {}
-
-def save_paid_db(data):
-    with open(PAID_DB_FILE, 'w') as f: json.dump(data, f, indent=4)
+        with zf.open(part) as f: head = f.read(4096)
+    except KeyError: return None
+    match = _DIMENSION_RE.search(head)
+    return match.group(1).decode() if match else None
+
+def _load_workbook_meta(path):
+    with zipfile.ZipFile(path) as zf:
+        # Parts every sheet's values depend on besides its own (string table, number formats)
+        names = set(zf.namelist())
+        shared = tuple(zf.getinfo(n).CRC for n in ('xl/sharedStrings.xml', 'xl/styles.xml') if n in names)
+
+        rels = {}
+        for rel in ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels')):
+            target = rel.get('Target', '')
+            rels[rel.get('Id')] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+
+        sheets = []
+        for el in ElementTree.fromstring(zf.read('xl/workbook.xml')).iter():
+            if _xml_local(el.tag) != 'sheet': continue
+            rel_id = next((v for k, v in el.attrib.items() if _xml_local(k) == 'id'), None)
+            dimension = _read_sheet_dimension(zf, rels[rel_id]) if rel_id in rels else None
+            max_row = max_col = None
+            if dimension:
+                try: _, _, max_col, max_row = xl_cell.range_boundaries(dimension)
+                except (ValueError, TypeError): pass
+            part = rels.get(rel_id)
+            info = zf.getinfo(part) if part in names else None
+            sheets.append({
+                'name': el.get('name'),
+                'index': len(sheets),
+                'part': part,
+                'state': el.get('state', 'visible'),
+                'dimension': dimension,
+                'max_row': max_row,
+                'max_col': max_col,
+                # Changes only when this sheet's content does (zip CRCs, no decompression)
+                'fingerprint': (info.CRC, info.file_size, shared) if info else None
+            })
+    return sheets
+
+def get_workbook_meta():
+    """Sheet names, order and dimensions, cached per workbook_version(). None if unreadable."""
+    global _workbook_meta
+    version = workbook_version()
+    if version is None: return None
+    cached = _workbook_meta
+    if cached and cached['version'] == version: return cached
+    with _workbook_meta_lock:
+        if _workbook_meta and _workbook_meta['version'] == version: return _workbook_meta
+        try: sheets = _load_workbook_meta(FILE_NAME)
+        except Exception as e:
+            log.error(f"Reading workbook metadata failed: {e}")
+            return None
+        _workbook_meta = {'version': version, 'sheets': sheets}
+        return _workbook_meta
+
+def read_cached_values(sheet_name):
+    """{(row, col): cached result} for every formula cell of a sheet, streamed from its XML part.
+
+    This is what a data_only=True load would report for those cells (None when Excel never
+    computed them), without loading the workbook a second time.
+    """
+    meta = get_workbook_meta()
+    part = next((s['part'] for s in meta['sheets'] if s['name'] == sheet_name), None) if meta else None
+    if not part: return {}
+
+    cached = {}
+    with zipfile.ZipFile(FILE_NAME) as zf, zf.open(part) as f:
+        for _, el in ElementTree.iterparse(f):
+            if _xml_local(el.tag) != 'c': continue
+            formula = value = None
+            for child in el:
+                tag = _xml_local(child.tag)
+                if tag == 'f': formula = child
+                elif tag == 'v': value = child.text
+            if formula is not None:
+                cached[xl_cell.coordinate_to_tuple(el.get('r'))] = _cast_cached_value(value, el.get('t', 'n'))
+            el.clear()
+    return cached
+
+def _cast_cached_value(value, cell_type):
+    # Same conversions openpyxl applies when reading values
+    if value is None: return None
+    if cell_type == 'n':
+        return float(value) if any(ch in value for ch in '.Ee') else int(value)
+    if cell_type == 'b': return bool(int(value))
+    return value
+
+def sheet_fingerprint(sheet_name):
+    """Content fingerprint of one sheet; falls back to the whole-workbook version."""
+    meta = get_workbook_meta()
+    entry = next((s for s in meta['sheets'] if s['name'] == sheet_name), None) if meta else None
+    return (entry and entry['fingerprint']) or workbook_version()
 
 # --- HELPER: GET ALL SHEET NAMES (MONTHS) ---
 def get_all_sheet_names():
-    if not os.path.exists(FILE_NAME): return []
+    meta = get_workbook_meta()
+    return [s['name'] for s in meta['sheets']] if meta else []
+
+# --- SHEET TEXT SIDECARS ---
+# Everything the readers take from a sheet is str() of the values pd.read_excel reports.
+# That text is saved once per sheet content as one .npy per column, in a directory named
+# after the sheet and its fingerprint; later reads memory-map just the columns they use
+# instead of inflating and parsing the sheet XML. A write changes the sheet's fingerprint,
+# so a stale sidecar is simply never looked up again (and is replaced on the next read).
+class SheetText:
+    """Cell text of one sheet, by column. column() returns a str array."""
+    def __init__(self, shape, load_column):
+        self.shape = shape
+        self._load_column = load_column
+        self._columns = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        columns = [np.array([str(v) for v in df.iloc[:, c].to_numpy(dtype=object)], dtype=str)
+                   for c in range(df.shape[1])]
+        return cls(df.shape, columns.__getitem__)
+
+    def column(self, col):
+        if col not in self._columns: self._columns[col] = self._load_column(col)
+        return self._columns[col]
+
+    def cell(self, row, col):
+        if not (0 <= col < self.shape[1] and 0 <= row < self.shape[0]): raise IndexError((row, col))
+        return str(self.column(col)[row])
+
+def _sidecar_path(sheet_name, fingerprint):
+    sheet_key = hashlib.sha1(sheet_name.encode()).hexdigest()[:16]
+    content_key = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:16]
+    return os.path.join(SIDECAR_DIR, f"{sheet_key}-{content_key}")
+
+def _read_sidecar(path):
+    # Map every column now: a mapping outlives the file, so a newer sidecar replacing this
+    # one (see _write_sidecar) can't pull columns out from under a parse in progress
     try:
-        wb = openpyxl.load_workbook(FILE_NAME, read_only=True)
-        names = wb.sheetnames
-        wb.close()
-        return names
-    except: return []
+        with open(os.path.join(path, 'shape.json')) as f: shape = tuple(json.load(f))
+        columns = [np.load(os.path.join(path, f"c{c}.npy"), mmap_mode='r') for c in range(shape[1])]
+    except (OSError, ValueError): return None
+    return SheetText(shape, columns.__getitem__)
+
+def _write_sidecar(path, text):
+    """Writes into a temp dir then renames it into place, removing older copies of the sheet."""
+    tmp = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        for c in range(text.shape[1]): np.save(os.path.join(tmp, f"c{c}.npy"), text.column(c))
+        with open(os.path.join(tmp, 'shape.json'), 'w') as f: json.dump(list(text.shape), f)
+        os.rename(tmp, path)
+    except OSError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(path): log.error(f"Writing sheet sidecar failed: {e}")
+        return
+    prefix = os.path.basename(path).split('-')[0] + '-'
+    for name in os.listdir(SIDECAR_DIR):
+        if name.startswith(prefix) and name != os.path.basename(path) and '.tmp' not in name:
+            shutil.rmtree(os.path.join(SIDECAR_DIR, name), ignore_errors=True)
+
+def read_sheet_text(sheet_name, path=None, columns=None):
+    """SheetText for a sheet of the live workbook, from its sidecar when one is current.
+    Without a sidecar, columns (0-based indices) limits the read to those columns; the
+    others read as blank and no sidecar is written for the partial text."""
+    path = path or FILE_NAME
+    fingerprint = None
+    if SIDECAR_DIR and path == FILE_NAME:
+        meta = get_workbook_meta()
+        entry = next((s for s in meta['sheets'] if s['name'] == sheet_name), None) if meta else None
+        fingerprint = entry and entry['fingerprint']
+    if fingerprint:
+        sidecar = _sidecar_path(sheet_name, fingerprint)
+        text = _read_sidecar(sidecar)
+        if text is not None: return text
+
+    log.debug(f"Reading sheet '{sheet_name}' from workbook")
+    if columns is not None:
+        dims = _sheet_dimensions(sheet_name) if path == FILE_NAME else None
+        present = sorted(c for c in columns if not dims or c < dims[1]) # read_excel rejects columns past the edge
+        if not present: return SheetText((0, 0), None)
+        with timed('wb_open'):
+            df = pd.read_excel(path, sheet_name=sheet_name, header=None, usecols=present, engine='openpyxl')
+        read = {c: np.array([str(v) for v in df[c].to_numpy(dtype=object)], dtype=str) for c in df.columns}
+        blank = np.full(len(df), 'nan')
+        return SheetText((len(df), max(columns) + 1), lambda c: read.get(c, blank))
+    with open(path, 'rb') as f, timed('wb_open'):
+        if fingerprint:
+            # Fingerprint the file being read: a save that landed since the lookup above
+            # must not get its content filed under the old fingerprint
+            entry = next((s for s in _load_workbook_meta(f) if s['name'] == sheet_name), None)
+            fingerprint = entry and entry['fingerprint']
+            f.seek(0)
+        text = SheetText.from_frame(pd.read_excel(f, sheet_name=sheet_name, header=None, engine='openpyxl'))
+    if fingerprint:
+        os.makedirs(SIDECAR_DIR, exist_ok=True)
+        _write_sidecar(_sidecar_path(sheet_name, fingerprint), text)
+    return text
+
+# --- LEDGER BLOCK PARSER ---
+LEDGER_CONFIGS = [
+    {'label_col': 0, 'data_col': 1, 'comm_col': 2, 'amt_col': 3},
+    {'label_col': 5, 'data_col': 6, 'comm_col': 7, 'amt_col': 8}
+]
+_BLANK_CELLS = ('NAN', 'NONE', '')
+
+def _column_text(sheet, col):
+    """Text of every cell in a column of a SheetText, as a string Series."""
+    return pd.Series(sheet.column(col).tolist(), dtype=object)
+
+def _column_amounts(text):
+    """clean_num() over a whole text column; cells pandas can't parse come back as NaN."""
+    cleaned = text.str.replace(',', '', regex=False).str.replace('₹', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=float, copy=True)
+
+def _scan_ledger_block(sheet, config, member_map, members_list, paid_db):
+    """Column-wise scan of one ledger group (e.g. A-D) for NAME ... TOTAL blocks.
+
+    Rows are classified with vector string ops, each numeric month row is assigned
+    to the nearest NAME row above it (unless a TOTAL or blank NAME row intervenes),
+    and members/items are then built from the resulting arrays.
+    """
+    raw_labels = _column_text(sheet, config['label_col'])
+    labels = raw_labels.str.strip().str.upper()
+    is_header = (labels == 'NAME').to_numpy()
+    is_month = labels.str.replace('.', '', n=1, regex=False).str.isdigit().to_numpy() & ~is_header
+    is_total = labels.str.contains('TOTAL', regex=False).to_numpy() & ~is_header & ~is_month
+
+    data_text = _column_text(sheet, config['data_col'])
+    comm_text = _column_text(sheet, config['comm_col'])
+
+    # Members, in row order. owner[r] is the member that header row r opens (None = no member).
+    header_rows = np.flatnonzero(is_header)
+    owners = [None] * len(header_rows)
+    for i, r in enumerate(header_rows):
+        raw_name = data_text.iat[r].strip().title()
+        if raw_name.upper() in _BLANK_CELLS: continue
+
+        raw_area = comm_text.iat[r].strip().title()
+        if raw_area.upper() in _BLANK_CELLS:
+            raw_area = "General"
+
+        norm_n = normalize_text(raw_name)
+        unique_key = f"{norm_n}_{normalize_text(raw_area)}"
+        if unique_key not in member_map:
+            member = LedgerMember(raw_name, sys.intern(raw_area), sys.intern(unique_key), norm_n)
+            members_list.append(member)
+            member_map[unique_key] = member
+        owners[i] = member_map[unique_key]
+
+    # Forward-fill the last block marker over each row: header position, or -1 after TOTAL / blank NAME
+    marker = np.full(len(labels), np.nan)
+    marker[is_total] = -1
+    marker[header_rows] = [i if owners[i] is not None else -1 for i in range(len(header_rows))]
+    owner_idx = pd.Series(marker).ffill().fillna(-1).to_numpy(dtype=int)
+
+    candidates = np.flatnonzero(is_month & (owner_idx >= 0))
+    if not len(candidates): return
+
+    amt_text = _column_text(sheet, config['amt_col'])
+    amounts = _column_amounts(amt_text.iloc[candidates])
+    for pos in np.flatnonzero(np.isnan(amounts)):
+        # Rare odd strings: defer to clean_num so the result matches it exactly
+        amounts[pos] = clean_num(amt_text.iat[candidates[pos]])
+    keep = np.isfinite(amounts) & (amounts > 0)
+
+    for r, amt in zip(candidates[keep], amounts[keep]):
+        member = owners[owner_idx[r]]
+        amt = float(amt)
+        month_label = sys.intern(raw_labels.iat[r].strip())
+        plan_val = sys.intern(data_text.iat[r].strip())
+
+        # Generate Item ID
+        item_id = f"{member.norm_name}_{int(amt)}_{month_label}_{plan_val}".replace(" ", "").replace(".","")
+
+        # Check payment status
+        member.add(LedgerItem(month_label, plan_val, sys.intern(comm_text.iat[r].strip()), amt, item_id, paid_db.get(item_id)))
 
-# --- 1. DASHBOARD READER (Supports specific sheet_name) ---
 # --- 1. DASHBOARD READER (Supports specific sheet_name) ---
 def get_excel_data(sheet_name=None):
-    if not os.path.exists(FILE_NAME): return []
+    """The sheet as plain dicts ({members, grand_total, calculated_total}); [] if unreadable."""
+    ledger = get_ledger(sheet_name)
+    return ledger.to_dict() if ledger else []
+
+def get_ledger(sheet_name=None):
+    """Cached ParsedLedger for a sheet (default: first sheet), or None if it can't be read."""
+    if not os.path.exists(FILE_NAME): return None
     try:
         # DEBUG: Print sheet names to verify order
-        wb_temp = openpyxl.load_workbook(FILE_NAME, read_only=True)
-        all_sheets = wb_temp.sheetnames
-        print(f"DEBUG: All Sheets: {all_sheets}")
-        wb_temp.close()
+        all_sheets = get_all_sheet_names()
+        log.debug(f"All Sheets: {all_sheets}")
 
         # If no sheet specified, default to the FIRST sheet (Index 0)
         # because run_auction_batch moves the NEW sheet to the Front.
@@ -162,129 +1445,43 @@ def get_excel_data(sheet_name=None):
             if all_sheets:
                 sheet_name = all_sheets[0] 
             else:
-                return []
-            
-        print(f"DEBUG: Reading sheet '{sheet_name}'")
-        df = pd.read_excel(FILE_NAME, sheet_name=sheet_name, header=None, engine='openpyxl')
+                return None
+
+        key = (sheet_fingerprint(sheet_name), sheet_name, paid_db_version())
+        return LEDGER_CACHE.get_or_load(key, lambda: _parse_excel_data(sheet_name))
     except Exception as e:
-        print(f"ERROR in get_excel_data: {e}")
-        traceback.print_exc()
-        return []
+        log.exception(f"get_excel_data failed: {e}")
+        return None
 
-    paid_db = load_paid_db()
-    members_list = []
+def _parse_excel_data(sheet_name, path=None, paid_db=None):
+    """Parses one sheet into the member structure. Raises on read errors.
 
-    # --- STEP 1: BUILD MASTER LIST ---
-    member_map = {}
-    name_only_map = {}
+    path/paid_db default to the live workbook and PAYMENTS; report workers pass a plain
+    {item_id: paid_on} snapshot instead, since they run in another process.
+    """
+    sheet = read_sheet_text(sheet_name, path)
+
+    if paid_db is None: paid_db = PAYMENTS
+    members_list = []
 
     # --- STEP 1: SCAN LEDGER BLOCKS (Authoritative Member Data) ---
     # Ledger columns are typically:
     # A (0): Month/Label, B (1): Plan/Name, C (2): Commission, D (3): Amount
     # F (5): Month/Label, G (6): Plan/Name, H (7): Commission, I (8): Amount
-    
-    ledger_configs = [
-        {'label_col': 0, 'data_col': 1, 'comm_col': 2, 'amt_col': 3},
-        {'label_col': 5, 'data_col': 6, 'comm_col': 7, 'amt_col': 8}
-    ]
-
-    for config in ledger_configs:
-        curr_member = None
-        curr_area = "General"
-        
-        for r in range(df.shape[0]):
-            try:
-                cell_label = str(df.iloc[r, config['label_col']]).strip().upper()
-                
-                # Detect Member Header
-                if cell_label == 'NAME':
-                    raw_name = str(df.iloc[r, config['data_col']]).strip().title()
-                    if not raw_name or raw_name.upper() in ['NAN', 'NONE', '']:
-                        curr_member = None
-                        continue
-                        
-                    raw_area = str(df.iloc[r, config['comm_col']]).strip().title()
-                    if not raw_area or raw_area.upper() in ['NAN', 'NONE', '']:
-                        raw_area = "General"
-                    
-                    norm_n = normalize_text(raw_name)
-                    norm_a = normalize_text(raw_area)
-                    unique_key = f"{norm_n}_{norm_a}"
-                    
-                    if unique_key not in member_map:
-                        curr_member = {
-                            'name': raw_name,
-                            'area': raw_area,
-                            'total': 0,
-                            'items': [],
-                            'payment_id': f"{raw_name}_0".replace(" ", ""), # Temporary
-                            'is_paid': False,
-                            'paid_date': None
-                        }
-                        members_list.append(curr_member)
-                        member_map[unique_key] = curr_member
-                        name_only_map.setdefault(norm_n, []).append(curr_member)
-                    else:
-                        curr_member = member_map[unique_key]
-
-                # Detect Individual Plan Rows (Numeric Month)
-                elif curr_member and cell_label.replace('.','',1).isdigit():
-                    month_label = str(df.iloc[r, config['label_col']]).strip()
-                    plan_val = str(df.iloc[r, config['data_col']]).strip()
-                    comm_val = str(df.iloc[r, config['comm_col']]).strip()
-                    amt = clean_num(df.iloc[r, config['amt_col']])
-                    
-                    if amt > 0:
-                        # Generate Item ID
-                        item_id = f"{normalize_text(curr_member['name'])}_{int(amt)}_{month_label}_{plan_val}".replace(" ", "").replace(".","")
-                        
-                        # Check payment status
-                        db_entry = paid_db.get(item_id)
-                        item_is_paid = False
-                        item_paid_date = None
-                        if db_entry:
-                            item_is_paid = True
-                            if isinstance(db_entry, str): item_paid_date = db_entry
-
-                        curr_member['items'].append({
-                            'month': month_label,
-                            'plan': plan_val,
-                            'commission': comm_val,
-                            'amount': amt,
-                            'id': item_id,
-                            'is_paid': item_is_paid,
-                            'paid_date': item_paid_date
-                        })
-                        
-                        # Update Member-level payment_id (legacy support)
-                        curr_member['payment_id'] = f"{curr_member['name']}_{int(sum(i['amount'] for i in curr_member['items']))}".replace(" ", "")
-
-                # Reset member at block end
-                elif 'TOTAL' in cell_label:
-                    curr_member = None
-
-            except Exception as e:
-                pass
+    member_map = {}
+    with timed('parse'):
+        for config in LEDGER_CONFIGS:
+            if sheet.shape[1] <= config['amt_col']: continue
+            _scan_ledger_block(sheet, config, member_map, members_list, paid_db)
 
     # --- STEP 2: SCAN FOR COMMISSIONS (Columns B and G specifically for 'Comm.') ---
     # Many users have 'Comm.' rows in their plans. Our Ledger scan above handles them if they have numeric months.
     # If they are listed separately, we'll find them here.
     # Actually, the ledger scan is comprehensive enough. We'll add a specific check for Row-based Grand Totals.
 
-    # --- STEP 4: RE-CALCULATE MEMBER TOTALS with Partial Logic ---
-    final_list = []
-    
-    for m in members_list:
-        if m['items']:
-            # Calculate total from items to be safe
-            m['total'] = sum(i['amount'] for i in m['items'])
-            m['paid_amount'] = sum(i['amount'] for i in m['items'] if i['is_paid'])
-            m['is_paid'] = (m['paid_amount'] >= m['total']) and (m['total'] > 0)
-        else:
-            # Fallback for members without items
-            m['paid_amount'] = m['total'] if m['is_paid'] else 0
-            
-        final_list.append(m)
+    # --- STEP 4: MEMBER TOTALS ---
+    # Kept up to date by LedgerMember.add() while the blocks were scanned
+    final_list = members_list
 
     # --- STEP 5: GET EXPLICIT GRAND TOTAL ---
     # The excel has a trusted Grand Total at Row 23, Col 15 (Index 22, 14 0-indexed)
@@ -292,223 +1489,434 @@ def get_excel_data(sheet_name=None):
     grand_total_val = 0
     try:
         # Check specific cell
-        raw_gt = df.iloc[22, 14]
+        raw_gt = sheet.cell(22, 14)
         grand_total_val = clean_num(raw_gt)
         if math.isnan(grand_total_val): grand_total_val = 0
         
-        print(f"DEBUG: Grand Total from Excel cell [22,14]: {grand_total_val}")
+        log.debug(f"Grand Total from Excel cell [22,14]: {grand_total_val}")
         # Validate order of magnitude (should be > 100k)
         if grand_total_val < 100000:
              # Fallback scan: maybe its somewhere else or sheet is smaller
-             print("DEBUG: Grand Total cell too small, scanning column 14 for 'Grand Total' text...")
-             for r in range(df.shape[0]):
-                 try:
-                     label = str(df.iloc[r, 13]).upper()
-                     if 'GRAND TOTAL' in label or 'TOTAL' in label:
-                         val = clean_num(df.iloc[r, 14])
-                         if not math.isnan(val) and val > 100000: 
-                             grand_total_val = val
-                             break
-                 except: pass
+             log.debug("Grand Total cell too small, scanning column 14 for 'Grand Total' text...")
+             labels = _column_text(sheet, 13).str.upper()
+             values = _column_text(sheet, 14)
+             for r in np.flatnonzero(labels.str.contains('TOTAL', regex=False).to_numpy()):
+                 val = clean_num(values.iat[r])
+                 if not math.isnan(val) and val > 100000:
+                     grand_total_val = val
+                     break
     except Exception as e: 
-        print(f"DEBUG Error in Grand Total extraction: {e}")
+        log.debug(f"Error in Grand Total extraction: {e}")
         pass
     
     if math.isnan(grand_total_val): grand_total_val = 0
     # Calculate a sum of all found members for consistency
-    calculated_total = sum(m['total'] for m in final_list)
+    calculated_total = sum(m.total for m in final_list)
     
-    print(f"DEBUG: Returning {len(final_list)} members. Grand Total (Excel): {grand_total_val}, Calculated Total: {calculated_total}")
+    log.debug(f"Returning {len(final_list)} members. Grand Total (Excel): {grand_total_val}, Calculated Total: {calculated_total}")
     
+    with timed('build'):
+        members = sorted(final_list, key=lambda x: x.name)
+        item_index = {}
+        for pos, m in enumerate(members):
+            for item in m.items:
+                positions = item_index.setdefault(item.id, [])
+                if not positions or positions[-1] != pos: positions.append(pos)
+        index = MemberIndex(members)
+
     # Return structure with metadata
-    return {
-        'members': sorted(final_list, key=lambda x: x['name']),
-        'grand_total': grand_total_val,
-        'calculated_total': calculated_total
-    }
+    return ParsedLedger(members, grand_total_val, calculated_total, item_index, index)
 
 # --- 2. AUCTION READER ---
+# The auction page needs the auction list (L-N) and, for member counts, the month/plan
+# columns of the two ledger groups (A-B, F-G): only those columns are read, and the result
+# is kept until the default sheet's content changes.
+AUCTION_COLUMNS = (0, 1, 5, 6, 11, 12, 13)
+_auction_plans = None # {'key': (sheet, fingerprint), 'plans': [...]}
+_auction_plans_lock = threading.Lock()
+
+def _ledger_plan_counts(sheet):
+    """{(plan value, month key): number of ledger rows} over both ledger groups: the rows
+    an auction bid for that plan and month would update."""
+    counts = {}
+    for config in LEDGER_CONFIGS:
+        if sheet.shape[1] <= config['data_col']: continue
+        labels = _column_text(sheet, config['label_col']).str.strip()
+        plans = sheet.column(config['data_col'])
+        for r in np.flatnonzero(labels.str.replace('.', '', n=1, regex=False).str.isdigit().to_numpy()):
+            key = (clean_plan_amount(str(plans[r]).strip()), _month_key(labels.iat[r]))
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
 def get_auction_plans():
+    """Auction groups of the default (first) sheet, cached per content of that sheet."""
+    global _auction_plans
     if not os.path.exists(FILE_NAME): return []
-    try: df = pd.read_excel(FILE_NAME, header=None, engine='openpyxl')
-    except: return []
+    sheet_names = get_all_sheet_names()
+    if not sheet_names: return []
+    key = (sheet_names[0], sheet_fingerprint(sheet_names[0]))
+    cached = _auction_plans
+    if cached and cached['key'] == key: return cached['plans']
+    with _auction_plans_lock:
+        if _auction_plans and _auction_plans['key'] == key: return _auction_plans['plans']
+        try:
+            with timed('auction_plans'): plans = _read_auction_plans(sheet_names[0])
+        except Exception as e:
+            log.error(f"Reading auction plans failed: {e}")
+            return []
+        _auction_plans = {'key': key, 'plans': plans}
+        return plans
+
+def _read_auction_plans(sheet_name):
+    sheet = read_sheet_text(sheet_name, columns=AUCTION_COLUMNS)
     plans = []
     for r in range(2, 50):
         try:
-            m_val = str(df.iloc[r, 11]).strip()
-            p_val_raw = str(df.iloc[r, 12]).strip()
+            m_val = sheet.cell(r, 11).strip()
+            p_val_raw = sheet.cell(r, 12).strip()
             if not m_val or m_val.upper() == 'NAN': continue
-            if 'TOTAL' in str(df.iloc[r, 13]).upper(): break
+            if 'TOTAL' in sheet.cell(r, 13).upper(): break
             p_val = clean_plan_amount(p_val_raw)
             if p_val > 0:
-                plans.append({'current_month': m_val, 'plan_display': p_val_raw, 'plan_value': p_val, 'id': f"{m_val}_{p_val}", 'member_count': "-"})
+                plans.append({'current_month': m_val, 'plan_display': p_val_raw, 'plan_value': p_val, 'id': f"{m_val}_{p_val}"})
         except: pass
+    counts = _ledger_plan_counts(sheet) if plans else {}
+    for plan in plans: plan['member_count'] = counts.get((plan['plan_value'], _month_key(plan['current_month'])), 0)
     return plans
 
 # --- 3. AUCTION UPDATER (FIXED: Month Format + Zero Commission Total) ---
-@app.route('/run-auction-batch', methods=['POST'])
-def run_auction_batch():
-    if 'user' not in session: return redirect(url_for('login_page'))
-    try:
-        global_date = request.form.get('global_date')
-        sheet_name_suffix = request.form.get('sheet_name')
-
-        updates = {}
-        # 1. Parse Inputs
-        for key, val in request.form.items():
-            if key.startswith('bid_for_'):
-                unique_id = key.replace('bid_for_', '')
-                new_m = request.form.get(f'new_month_for_{unique_id}')
-                bid = request.form.get(f'bid_for_{unique_id}')
-
-                # Check if new_m and bid exist (strings "0" are True, empty strings are False)
-                if new_m and bid is not None:
-                    try:
-                        total_bid = float(bid)
-                        plan_val = int(unique_id.split('_')[1])
-                        dividend = total_bid / 20
-                        payable_amount = (plan_val - total_bid) / 20
-
-                        updates[unique_id] = {
-                            'new_month': str(new_m).strip(),
-                            'new_dividend': int(dividend),
-                            'new_payable': int(payable_amount),
-                            'plan_val': plan_val,
-                            'total_bid': total_bid,
-                            'old_month_prefix': unique_id.split('_')[0]
-                        }
-                    except: continue
-
-        if not updates: return "Error: No Valid Inputs"
-
-        # Helper: Month Matcher
-        def is_same_month(m1, m2):
-            s1 = str(m1).strip()
-            s2 = str(m2).strip()
-            if s1 == s2: return True
-            try: return abs(float(s1) - float(s2)) < 0.001
-            except: return False
-
-        # Load Workbooks
-        wb_data = openpyxl.load_workbook(FILE_NAME, data_only=True)
-        source_sheet_data = wb_data.active
-
-        wb = openpyxl.load_workbook(FILE_NAME)
-        source_sheet = wb.active
-        target_sheet = wb.copy_worksheet(source_sheet)
-        target_sheet.title = sheet_name_suffix
-        wb.move_sheet(target_sheet, offset=-len(wb.sheetnames)+1)
-        wb.active = target_sheet
-
-        # Helper: Month Formatter (20 vs 20.0)
-        def process_month_value(val):
-            try:
-                f_val = float(val)
-                if f_val.is_integer(): return int(f_val)
-                return f_val
-            except: return val
-
-        # Map Summary Locations
-        summary_locs = {}
-        for name_col in [20, 24]:
-             for r in range(1, target_sheet.max_row + 1):
-                 name = str(target_sheet.cell(row=r, column=name_col).value).strip().title()
-                 if name and name.upper() not in ['NAN', 'NAME', 'AMOUNT']:
-                     if name not in summary_locs: summary_locs[name] = []
-                     summary_locs[name].append({'row': r, 'col': name_col-1})
-
-        # --- UPDATE LOOP 1: Main Ledger ---
-        for col_start in [1, 6]:
-            curr_member = None
-            block_sum = 0      # Sum of Payable Amount
-            dividend_sum = 0   # Sum of Commission/Dividend
-
-            for row in range(1, target_sheet.max_row + 1):
-                cell_val = str(target_sheet.cell(row=row, column=col_start).value).upper()
+def _month_key(month):
+    """Month label normalised for bid lookups ('20', '20.0' and 20 are the same month)."""
+    s = str(month).strip()
+    try: return round(float(s), 3)
+    except ValueError: return s
+
+class AuctionInputError(ValueError):
+    """The auction form had nothing usable in it."""
+
+def apply_auction(form, progress=None):
+    """Copies the default sheet into a new tab with the bids from the auction form applied and
+    saves the workbook. progress(stage, fraction) is called as the work advances. Returns a
+    summary: the new sheet name and how many rows changed. Callers hold workbook_write_lock()."""
+    report = progress or (lambda stage, fraction: None)
+    global_date = form.get('global_date')
+    sheet_name_suffix = form.get('sheet_name')
+
+    updates = {}
+    # 1. Parse Inputs
+    for key, val in form.items():
+        if key.startswith('bid_for_'):
+            unique_id = key.replace('bid_for_', '')
+            new_m = form.get(f'new_month_for_{unique_id}')
+            bid = form.get(f'bid_for_{unique_id}')
+
+            # Check if new_m and bid exist (strings "0" are True, empty strings are False)
+            if new_m and bid is not None:
+                try:
+                    total_bid = float(bid)
+                    plan_val = int(unique_id.split('_')[1])
+                    dividend = total_bid / 20
+                    payable_amount = (plan_val - total_bid) / 20
+
+                    updates[unique_id] = {
+                        'new_month': str(new_m).strip(),
+                        'new_dividend': int(dividend),
+                        'new_payable': int(payable_amount),
+                        'plan_val': plan_val,
+                        'total_bid': total_bid,
+                        'old_month_prefix': unique_id.split('_')[0]
+                    }
+                except: continue
+
+    if not updates: raise AuctionInputError("No Valid Inputs")
+
+    # Index bids by (plan value, month) so matching a ledger row is one dict lookup.
+    # Ledger rows take the first bid for a key, the auction list the last (as before).
+    bids = {}
+    for upd in updates.values():
+        bids.setdefault((upd['plan_val'], _month_key(upd['old_month_prefix'])), []).append(upd)
+
+    # Load Workbook (formulas), plus the source sheet's cached formula results
+    report('loading', 0.05)
+    with timed('wb_open'): wb = openpyxl.load_workbook(FILE_NAME)
+    source_sheet = wb.active
+    cached = read_cached_values(source_sheet.title)
+    rows = list(source_sheet.iter_rows(values_only=True))
+
+    def value(r, c):
+        # Cell content as loaded (formula text for formula cells)
+        if r > len(rows): return None
+        row = rows[r-1]
+        return row[c-1] if c <= len(row) else None
+
+    def data_value(r, c):
+        # Cell content as a data_only load sees it (cached result for formula cells)
+        return cached[(r, c)] if (r, c) in cached else value(r, c)
+
+    target_sheet = wb.copy_worksheet(source_sheet)
+    target_sheet.title = sheet_name_suffix
+    wb.move_sheet(target_sheet, offset=-len(wb.sheetnames)+1)
+    wb.active = target_sheet
+
+    # Helper: Month Formatter (20 vs 20.0)
+    def process_month_value(val):
+        try:
+            f_val = float(val)
+            if f_val.is_integer(): return int(f_val)
+            return f_val
+        except: return val
+
+    # --- SINGLE PASS: Main Ledger (A-D, F-I), Summary name map (T/X) and Auction List (L-R) ---
+    ledgers = [{'col': c, 'member': None, 'block_sum': 0, 'dividend_sum': 0, 'summary_diffs': {}} for c in [1, 6]]
+    summary_locs = {}
+    changed_rows = set()
+
+    report('updating', 0.3)
+    max_row = source_sheet.max_row
+    last_row = max(max_row, 99)
+    for row in range(1, last_row + 1):
+        if row % 500 == 0: report('updating', 0.3 + 0.4 * row / last_row)
+        if row <= max_row:
+            # Map Summary Locations
+            for name_col in [20, 24]:
+                name = str(value(row, name_col)).strip().title()
+                if name and name.upper() not in ['NAN', 'NAME', 'AMOUNT']:
+                    summary_locs.setdefault(name, []).append({'row': row, 'col': name_col-1})
+
+            for led in ledgers:
+                col_start = led['col']
+                label = value(row, col_start)
+                cell_val = str(label).upper()
 
                 # Header Reset
                 if 'NAME' in cell_val:
-                    curr_member = str(target_sheet.cell(row=row, column=col_start+1).value).strip().title()
+                    led['member'] = str(value(row, col_start+1)).strip().title()
                     target_sheet.cell(row=row, column=col_start+3).value = global_date
-                    block_sum = 0
-                    dividend_sum = 0 # Reset dividend sum for new block
+                    led['block_sum'] = 0
+                    led['dividend_sum'] = 0 # Reset dividend sum for new block
 
                 # Data Row Processing
-                val_check = str(target_sheet.cell(row=row, column=col_start).value).strip()
+                val_check = str(label).strip()
                 if val_check.replace('.','',1).isdigit():
-                    curr_m = val_check
-                    curr_p = str(target_sheet.cell(row=row, column=col_start+1).value).strip()
-                    curr_pv = clean_plan_amount(curr_p)
-
-                    old_pay_val = source_sheet_data.cell(row=row, column=col_start+3).value
-                    old_pay = clean_num(old_pay_val)
+                    curr_pv = clean_plan_amount(str(value(row, col_start+1)).strip())
+                    old_pay = clean_num(data_value(row, col_start+3))
                     current_item_amt = old_pay
-
                     # Get existing dividend (for sum calculation if not updated)
-                    old_div_val = source_sheet_data.cell(row=row, column=col_start+2).value
-                    current_dividend = clean_num(old_div_val)
-
-                    matched = None
-                    for uid, upd in updates.items():
-                        if upd['plan_val'] == curr_pv and is_same_month(upd['old_month_prefix'], curr_m):
-                            matched = upd; break
+                    current_dividend = clean_num(data_value(row, col_start+2))
 
+                    matched = bids.get((curr_pv, _month_key(val_check)))
                     if matched:
+                        matched = matched[0]
                         new_pay = matched['new_payable']
-                        diff = new_pay - old_pay
-
-                        fm = process_month_value(matched['new_month'])
 
-                        target_sheet.cell(row=row, column=col_start).value = fm
+                        target_sheet.cell(row=row, column=col_start).value = process_month_value(matched['new_month'])
                         target_sheet.cell(row=row, column=col_start+2).value = matched['new_dividend']
                         target_sheet.cell(row=row, column=col_start+3).value = new_pay
 
                         current_item_amt = new_pay
                         current_dividend = matched['new_dividend'] # Update dividend for sum
+                        changed_rows.add(row)
 
-                        # Update Summary Area (Right side of sheet)
-                        if curr_member and curr_member in summary_locs:
-                            for loc in summary_locs[curr_member]:
-                                old_sum_val = source_sheet_data.cell(row=loc['row'], column=loc['col']).value
-                                old_sum = clean_num(old_sum_val)
-                                target_sheet.cell(row=loc['row'], column=loc['col']).value = int(old_sum) + int(diff)
+                        # Summary Area (Right side of sheet) is written after the pass
+                        if led['member']: led['summary_diffs'][led['member']] = new_pay - old_pay
 
-                    block_sum += current_item_amt
-                    dividend_sum += current_dividend # Add to running total
+                    led['block_sum'] += current_item_amt
+                    led['dividend_sum'] += current_dividend # Add to running total
 
                 # Footer Total Update
                 if 'TOTAL' in cell_val:
-                    target_sheet.cell(row=row, column=col_start+3).value = int(block_sum)
+                    target_sheet.cell(row=row, column=col_start+3).value = int(led['block_sum'])
                     # FIX: Explicitly update the Total Commission cell
-                    target_sheet.cell(row=row, column=col_start+2).value = int(dividend_sum)
-                    block_sum = 0
-                    dividend_sum = 0
+                    target_sheet.cell(row=row, column=col_start+2).value = int(led['dividend_sum'])
+                    led['block_sum'] = 0
+                    led['dividend_sum'] = 0
 
-        # --- UPDATE LOOP 2: Auction List ---
-        for r in range(2, 100):
+        # Auction List (rows 2-99)
+        if 2 <= row < 100:
+            p_val = clean_plan_amount(str(data_value(row, 13)))
+            if p_val > 0:
+                matched = bids.get((p_val, _month_key(str(data_value(row, 12)).strip())))
+                if matched:
+                    upd = matched[-1]
+                    target_sheet.cell(row=row, column=12).value = process_month_value(upd['new_month'])
+                    target_sheet.cell(row=row, column=14).value = upd['total_bid']
+                    target_sheet.cell(row=row, column=16).value = upd['new_dividend']
+                    target_sheet.cell(row=row, column=18).value = upd['new_payable']
+                    changed_rows.add(row)
+
+    # Update Summary Area: old amount + change of the member's last re-bid item (A-D first, then F-I)
+    for member, diff in {**ledgers[0]['summary_diffs'], **ledgers[1]['summary_diffs']}.items():
+        for loc in summary_locs.get(member, []):
+            old_sum = clean_num(data_value(loc['row'], loc['col']))
+            target_sheet.cell(row=loc['row'], column=loc['col']).value = int(old_sum) + int(diff)
+            changed_rows.add(loc['row'])
+
+    report('saving', 0.75)
+    save_workbook(wb)
+    # Every sheet was rewritten and the new sheet is now the default
+    LEDGER_CACHE.invalidate()
+    # SYNC TO CLOUD
+    if USE_CLOUD_STORAGE: sync_up()
+    return {
+        'sheet_name': target_sheet.title,
+        'source_sheet': source_sheet.title,
+        'plans': len(updates),
+        'rows_changed': len(changed_rows)
+    }
+
+# --- AUCTION JOBS ---
+# An auction rewrites the whole workbook, which takes a while on a big file, so the auction
+# page submits it as a job and polls for the result. One runner thread works through the
+# queue in order and each job holds workbook_write_lock(), so an auction never interleaves
+# with another one or with sheet edits, in this worker or any other.
+AUCTION_JOB_HISTORY = int(os.environ.get('AUCTION_JOB_HISTORY', '50'))
+# Job status is also written here so a poll answered by another worker finds it
+AUCTION_JOB_DIR = os.path.join(os.path.dirname(FILE_NAME), '.auction_jobs')
+AUCTION_JOB_FILE_TTL = 24 * 3600
+
+class AuctionJobs:
+    """Queue of auction jobs, run one at a time. Finished jobs are kept (the newest
+    AUCTION_JOB_HISTORY of them) so their status can still be polled."""
+    def __init__(self, keep=AUCTION_JOB_HISTORY, state_dir=AUCTION_JOB_DIR):
+        self.keep = keep
+        self.state_dir = state_dir
+        self._cond = threading.Condition()
+        self._jobs = OrderedDict() # id -> job dict, oldest first
+        self._queue = deque()
+        self._thread = None
+
+    def submit(self, form):
+        job_id = os.urandom(8).hex()
+        with self._cond:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0.0,
+                'sheet_name': form.get('sheet_name'),
+                'submitted': time.time(),
+                'started': None,
+                'finished': None,
+                'result': None,
+                'error': None
+            }
+            self._queue.append((job_id, form))
+            self._persist(job_id)
+            self._trim()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='auction-jobs', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return self._view(job_id)
+
+    def get(self, job_id):
+        with self._cond:
+            if job_id in self._jobs: return self._view(job_id)
+        # Submitted to another worker
+        if not re.fullmatch(r'[0-9a-f]{16}', job_id): return None
+        try:
+            with open(os.path.join(self.state_dir, job_id + '.json')) as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job has finished (or timeout passes) and returns it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while job_id in self._jobs and self._jobs[job_id]['status'] in ('queued', 'running'):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: break
+                self._cond.wait(remaining)
+            return self._view(job_id)
+
+    def counts(self):
+        with self._cond:
+            counts = {}
+            for job in self._jobs.values(): counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+    def _view(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None: return None
+        view = dict(job)
+        if job['status'] == 'queued':
+            view['queue_position'] = next(i for i, (queued_id, _) in enumerate(self._queue) if queued_id == job_id) + 1
+        return view
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(self._jobs) - self.keep)]: del self._jobs[job_id]
+        # Status files outlive the worker that wrote them; drop old ones from every worker
+        cutoff = time.time() - AUCTION_JOB_FILE_TTL
+        try:
+            for entry in os.scandir(self.state_dir):
+                if entry.stat().st_mtime < cutoff: os.remove(entry.path)
+        except OSError: pass
+
+    def _persist(self, job_id):
+        # Caller holds self._cond
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with atomic_write(os.path.join(self.state_dir, job_id + '.json'), 'w') as f:
+                json.dump(self._jobs[job_id], f)
+        except OSError as e:
+            log.warning(f"Saving auction job {job_id} status failed: {e}")
+
+    def _update(self, job_id, **fields):
+        with self._cond:
+            self._jobs[job_id].update(fields)
+            self._persist(job_id)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue: self._cond.wait()
+                job_id, form = self._queue.popleft()
+
+            def progress(stage, fraction):
+                self._update(job_id, stage=stage, progress=round(fraction, 2))
+
+            self._update(job_id, status='running', stage='waiting', started=time.time())
             try:
-                p_val_raw = str(source_sheet_data.cell(row=r, column=13).value)
-                p_val = clean_plan_amount(p_val_raw)
-                m_val = str(source_sheet_data.cell(row=r, column=12).value).strip()
-
-                if p_val > 0:
-                    for uid, upd in updates.items():
-                        if upd['plan_val'] == p_val and is_same_month(upd['old_month_prefix'], m_val):
-                             fm = process_month_value(upd['new_month'])
-                             target_sheet.cell(row=r, column=12).value = fm
-                             target_sheet.cell(row=r, column=14).value = upd['total_bid']
-                             target_sheet.cell(row=r, column=16).value = upd['new_dividend']
-                             target_sheet.cell(row=r, column=18).value = upd['new_payable']
-            except: pass
-
-        wb.save(FILE_NAME)
-        wb_data.close()
-        # SYNC TO CLOUD
-        if USE_CLOUD_STORAGE: sync_up()
-        return redirect(url_for('dashboard'))
+                with workbook_write_lock(): result = apply_auction(form, progress)
+            except AuctionInputError as e: outcome = {'status': 'failed', 'error': f"Error: {e}"}
+            except PermissionError: outcome = {'status': 'failed', 'error': "ERROR: Close Excel file!"}
+            except Exception as e:
+                log.exception(f"Auction job {job_id} failed")
+                outcome = {'status': 'failed', 'error': f"Error: {e}"}
+            else:
+                outcome = {'status': 'done', 'stage': 'done', 'progress': 1.0, 'result': result}
+                log.info(f"Auction job {job_id}: created '{result['sheet_name']}', {result['rows_changed']} rows changed")
+            METRICS.inc('chitfund_auction_jobs_total', (('result', outcome['status']),))
+            self._update(job_id, finished=time.time(), **outcome)
+
+AUCTION_JOBS = AuctionJobs()
+METRICS.describe('chitfund_auction_jobs_total', 'counter', 'Finished auction jobs by result.')
+METRICS.gauge('chitfund_auction_jobs_queued', 'Auction jobs waiting to run.',
+              lambda: [((), AUCTION_JOBS.counts().get('queued', 0))])
+
+@app.route('/api/auction_jobs', methods=['POST'])
+def submit_auction_job():
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    job = AUCTION_JOBS.submit(request.form.to_dict())
+    return jsonify(job), 202, {'Location': url_for('auction_job_status', job_id=job['id'])}
+
+@app.route('/api/auction_jobs/<job_id>')
+def auction_job_status(job_id):
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    job = AUCTION_JOBS.get(job_id)
+    if job is None: return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/run-auction-batch', methods=['POST'])
+def run_auction_batch():
+    """Form fallback for browsers without JavaScript: queues the job and waits for it."""
+    if 'user' not in session: return redirect(url_for('login_page'))
+    job = AUCTION_JOBS.submit(request.form.to_dict())
+    job = AUCTION_JOBS.wait(job['id'])
+    if job['status'] == 'done': return redirect(url_for('dashboard'))
+    return job['error']
 
-    except PermissionError: return "ERROR: Close Excel file!"
-    except Exception as e: return f"Error: {e}\n{traceback.format_exc()}"
 
 # --- ROUTES ---
 @app.route('/')
@@ -530,47 +1938,257 @@ def dashboard():
 def members_page(): return render_template('members.html') if 'user' in session else redirect(url_for('login_page'))
 @app.route('/auction')
 def auction_page(): return render_template('auction.html', groups=get_auction_plans()) if 'user' in session else redirect(url_for('login_page'))
+# --- CONDITIONAL GETS ---
+# JSON APIs tag responses with an ETag built from the versions they depend on. Browsers
+# revalidate with If-None-Match, and a match is answered 304 before anything is read.
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+
+def not_modified(etag):
+    """A 304 response if the client already holds etag (in any content encoding), else None."""
+    for tag in (etag, f"{etag}-br", f"{etag}-gzip"):
+        if request.if_none_match.contains_weak(tag):
+            return tag_response(Response(status=304), tag)
+    return None
+
+def tag_response(resp, etag):
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache' # Always revalidate
+    return resp
+
+# --- RESPONSE ENCODING ---
+# JSON (and MessagePack) bodies over COMPRESS_MIN_BYTES are compressed with brotli when the
+# client accepts it and the module is installed, else gzip. Streamed responses are left alone.
+COMPRESS_MIN_BYTES = 1024
+_COMPRESSIBLE = ('application/json', 'application/msgpack')
+
+def _brotli():
+    try: import brotli
+    except ImportError: return None
+    return brotli
+
+@app.after_request
+def compress_response(resp):
+    if (resp.status_code != 200 or resp.is_streamed or resp.direct_passthrough
+            or resp.mimetype not in _COMPRESSIBLE or 'Content-Encoding' in resp.headers):
+        return resp
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES: return resp
+    brotli = _brotli() if request.accept_encodings['br'] else None
+    if brotli:
+        encoding, body = 'br', brotli.compress(data, quality=5)
+    elif request.accept_encodings['gzip']:
+        encoding, body = 'gzip', gzip.compress(data, compresslevel=6)
+    else:
+        return resp
+    resp.set_data(body)
+    resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    etag, weak = resp.get_etag()
+    if etag: resp.set_etag(f"{etag}-{encoding}", weak) # Each encoding is its own representation
+    return resp
+
+MEMBERS_PAGE_MAX = 500
+MEMBER_SEARCH_ARGS = ('query', 'area', 'status', 'sort', 'limit', 'cursor')
+
 @app.route('/api/members')
 def get_members_api():
+    """Members of a sheet. Optional: sheet, fields=name,area,... (projection), items=0
+    (drop item lists), format=columns|msgpack (columnar JSON / MessagePack body).
+
+    Search and paging: query (name/area word prefixes), area, status=paid|partial|pending,
+    sort=name|area|due|progress, limit and cursor (the next_cursor of the previous page).
+    Searched responses also carry matched, next_cursor and the sheet's areas."""
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
     # Optional: allow fetching data for a specific sheet (Month)
     sheet = request.args.get('sheet')
-    return jsonify(get_excel_data(sheet)) if 'user' in session else (jsonify({"error": "Unauthorized"}), 401)
+    fields = request.args.get('fields')
+    fields = [f for f in fields.split(',') if f] if fields else None
+    if fields and any(f not in MEMBER_FIELDS for f in fields):
+        return jsonify({'error': f"fields must be among {', '.join(MEMBER_FIELDS)}"}), 400
+    if request.args.get('items') == '0':
+        fields = [f for f in (fields or MEMBER_FIELDS) if f != 'items']
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'columns', 'msgpack'): return jsonify({'error': 'Unknown format'}), 400
+    search = {k: request.args[k] for k in MEMBER_SEARCH_ARGS if request.args.get(k)}
+    if search.get('status', 'paid') not in MEMBER_STATUSES:
+        return jsonify({'error': f"status must be one of {', '.join(MEMBER_STATUSES)}"}), 400
+    if search.get('sort', 'name') not in MEMBER_SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(MEMBER_SORTS)}"}), 400
+    try:
+        limit = min(int(search.get('limit', MEMBERS_PAGE_MAX)), MEMBERS_PAGE_MAX)
+        offset = int(search.get('cursor', 0))
+        if limit < 1 or offset < 0: raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit and cursor must be positive numbers'}), 400
+
+    sheet_names = get_all_sheet_names()
+    resolved = sheet or (sheet_names[0] if sheet_names else None)
+    etag = make_etag('members', resolved, sheet_fingerprint(resolved), paid_db_token(), fields, fmt, search)
+    cached = not_modified(etag)
+    if cached: return cached
+
+    ledger = get_ledger(sheet)
+    if not ledger: data = []
+    elif not search: data = ledger.to_dict(fields or MEMBER_FIELDS, columns=(fmt == 'columns'))
+    else:
+        with timed('search'):
+            matches = ledger.search(search.get('query'), search.get('area'), search.get('status'), search.get('sort', 'name'))
+        page = matches[offset:offset + limit]
+        data = ledger.to_dict(fields or MEMBER_FIELDS, columns=(fmt == 'columns'), positions=page)
+        data.update(matched=len(matches), areas=ledger.index.area_names,
+                    next_cursor=str(offset + limit) if offset + limit < len(matches) else None)
+    if fmt == 'msgpack':
+        try: import msgpack
+        except ImportError: return jsonify({'error': 'MessagePack is not available on this server'}), 406
+        resp = Response(msgpack.packb(data, use_bin_type=True), mimetype='application/msgpack')
+    else:
+        resp = jsonify(data)
+    return tag_response(resp, etag)
+
+@app.route('/api/summary')
+def get_summary_api():
+    """Totals of a sheet (default: the first) and of each area in it, without the member
+    lists: paid / partial / pending counts and amounts, collected, and the Excel grand total
+    next to the calculated one."""
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
+    sheet_names = get_all_sheet_names()
+    sheet = request.args.get('sheet') or (sheet_names[0] if sheet_names else None)
+    if sheet not in sheet_names: return jsonify({'error': 'Sheet not found'}), 404
+    etag = make_etag('summary', sheet, sheet_fingerprint(sheet), paid_db_token())
+    cached = not_modified(etag)
+    if cached: return cached
+    ledger = get_ledger(sheet)
+    if not ledger: return jsonify({'error': 'Sheet not found'}), 404
+    return tag_response(jsonify(dict(ledger.summary.to_dict(ledger.calculated_total), sheet=sheet)), etag)
 
 @app.route('/api/sheets')
 def get_sheets_api():
-    return jsonify({'sheets': get_all_sheet_names()}) if 'user' in session else (jsonify({"error": "Unauthorized"}), 401)
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
+    etag = make_etag('sheets', workbook_version())
+    return not_modified(etag) or tag_response(jsonify({'sheets': get_all_sheet_names()}), etag)
+
+@app.route('/api/sync_status')
+def sync_status_api():
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    if not USE_CLOUD_STORAGE: return jsonify({'enabled': False})
+    return jsonify(dict(SYNC_WORKER.status(), enabled=True, backend=STORAGE_BACKEND, hydration=STARTUP['hydration']))
 
 # --- EXCEL EDITOR API ---
+def _editor_value(val):
+    """Editor input -> cell value. Everything is str from JSON: numeric strings become
+    int/float, empty strings clear the cell, anything else is kept as typed."""
+    if not isinstance(val, str): return val
+    stripped = val.strip()
+    if stripped.replace('.','',1).isdigit():
+        try: return float(stripped) if '.' in stripped else int(stripped)
+        except ValueError: return val
+    if stripped == "": return None
+    return val
+
+def _editor_text(val):
+    """Cell value as /api/sheet_data shows it to the editor."""
+    if val is None: return ""
+    if isinstance(val, datetime): return val.strftime('%Y-%m-%d')
+    return str(val)
+
+def _sheet_dimensions(sheet_name):
+    """(max_row, max_col) of a sheet, from the metadata index when the sheet records its
+    <dimension>, else by scanning it read-only. None if the sheet doesn't exist."""
+    meta = get_workbook_meta()
+    entry = next((s for s in meta['sheets'] if s['name'] == sheet_name), None) if meta else None
+    if not entry: return None
+    if entry['max_row'] and entry['max_col']: return entry['max_row'], entry['max_col']
+    wb = openpyxl.load_workbook(FILE_NAME, read_only=True)
+    try:
+        ws = wb[sheet_name]
+        ws.reset_dimensions()
+        ws.calculate_dimension(force=True)
+        return ws.max_row or 1, ws.max_column or 1
+    finally:
+        wb.close()
+
+_WINDOW_ARG_ERROR = "start_row/start_col/rows/cols must be non-negative integers"
+
+def _window_arg(name, default):
+    value = request.args.get(name)
+    if value in (None, ''): return default
+    # A fixed message: int()'s own error would echo the raw query string back
+    try: value = int(value)
+    except ValueError: raise ValueError(_WINDOW_ARG_ERROR) from None
+    if value < 0: raise ValueError(_WINDOW_ARG_ERROR)
+    return value
+
+@app.route('/api/sheet_dimensions')
+def sheet_dimensions_api():
+    """Size of a sheet without reading its cells, so the editor can plan its windows."""
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    sheet_name = request.args.get('sheet')
+    if not sheet_name: return jsonify({'error': 'No sheet name'}), 400
+    try:
+        dims = _sheet_dimensions(sheet_name)
+        if not dims: return jsonify({'error': 'Sheet not found'}), 404
+        return jsonify({'rows': dims[0], 'cols': dims[1], 'version': workbook_token()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sheet_data')
 def get_sheet_data_api():
+    """Cells of a sheet as display strings, optionally a window of it.
+
+    start_row/start_col are 0-based (editor coordinates); rows/cols default to the rest of
+    the sheet. The sheet is read in read-only mode and the JSON is streamed row by row.
+    """
     if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
     sheet_name = request.args.get('sheet')
     if not sheet_name: return jsonify({'error': 'No sheet name'}), 400
-    
+
     try:
-        wb = openpyxl.load_workbook(FILE_NAME, data_only=False) # Get formulas if possible? No, for editing we want values usually, or raw? Jspreadsheet edits values.
-        # Actually data_only=False is better to edit formulas, but for this use case (simple data entry), values are fine. 
-        # But if we write back values, we lose formulas.
-        # Let's stick to data_only=False to read/write what is there.
-        if sheet_name not in wb.sheetnames: return jsonify({'error': 'Sheet not found'}), 404
-        ws = wb[sheet_name]
-        
-        data = []
-        for row in ws.iter_rows(values_only=True):
-            # cell values can be None, datetime, etc. Convert to friendly formats
-            clean_row = []
-            for cell in row:
-                if cell is None: clean_row.append("")
-                elif isinstance(cell, datetime): clean_row.append(cell.strftime('%Y-%m-%d'))
-                else: clean_row.append(str(cell))
-            data.append(clean_row)
-            
-        wb.close()
-        return jsonify({'data': data})
+        start_row, start_col = _window_arg('start_row', 0), _window_arg('start_col', 0)
+        row_count, col_count = _window_arg('rows', None), _window_arg('cols', None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The body carries the whole-workbook version (for patches), so that is what it depends on
+    etag = make_etag('sheet_data', sheet_name, workbook_version(), start_row, start_col, row_count, col_count)
+    cached = not_modified(etag)
+    if cached: return cached
+
+    try:
+        version = workbook_token()
+        dims = _sheet_dimensions(sheet_name)
+        if not dims: return jsonify({'error': 'Sheet not found'}), 404
+        max_row, max_col = dims
+        # Formulas, not cached values: whatever is written back must keep them
+        wb = openpyxl.load_workbook(FILE_NAME, read_only=True, data_only=False)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    last_row = max_row if row_count is None else min(max_row, start_row + row_count)
+    last_col = max_col if col_count is None else min(max_col, start_col + col_count)
+    width = max(last_col - start_col, 0)
+
+    def generate():
+        yield json.dumps({'version': version, 'rows': max_row, 'cols': max_col,
+                          'start_row': start_row, 'start_col': start_col})[:-1] + ', "data": ['
+        if last_row > start_row and width:
+            ws = wb[sheet_name]
+            rows = ws.iter_rows(min_row=start_row + 1, max_row=last_row,
+                                min_col=start_col + 1, max_col=last_col, values_only=True)
+            for i, row in enumerate(rows):
+                clean_row = [_editor_text(cell) for cell in row]
+                clean_row += [""] * (width - len(clean_row))
+                yield (',' if i else '') + json.dumps(clean_row, separators=(',', ':'))
+        yield ']}'
+
+    resp = Response(generate(), mimetype='application/json')
+    # Closed when the server is done with the response, even if the body is never read
+    # (HEAD, client gone, 304)
+    resp.call_on_close(wb.close)
+    return tag_response(resp, etag)
+
 @app.route('/api/delete_sheet', methods=['POST'])
+@workbook_writer
 def delete_sheet_api():
     if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
     try:
@@ -578,7 +2196,7 @@ def delete_sheet_api():
         sheet_name = req.get('sheet_name')
         if not sheet_name: return jsonify({'error': 'Missing sheet name'}), 400
         
-        wb = openpyxl.load_workbook(FILE_NAME)
+        with timed('wb_open'): wb = openpyxl.load_workbook(FILE_NAME)
         if sheet_name not in wb.sheetnames:
             wb.close()
             return jsonify({'error': 'Sheet not found'}), 404
@@ -588,8 +2206,9 @@ def delete_sheet_api():
             return jsonify({'error': 'Cannot delete the last remaining sheet'}), 400
             
         wb.remove(wb[sheet_name])
-        wb.save(FILE_NAME)
+        save_workbook(wb)
         wb.close()
+        LEDGER_CACHE.invalidate(sheet_name)
         
         # SYNC TO CLOUD
         if USE_CLOUD_STORAGE: sync_up()
@@ -599,6 +2218,7 @@ def delete_sheet_api():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/save_sheet_data', methods=['POST'])
+@workbook_writer
 def save_sheet_data_api():
     if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
     try:
@@ -608,7 +2228,7 @@ def save_sheet_data_api():
         
         if not sheet_name or not data: return jsonify({'error': 'Missing data'}), 400
         
-        wb = openpyxl.load_workbook(FILE_NAME)
+        with timed('wb_open'): wb = openpyxl.load_workbook(FILE_NAME)
         if sheet_name not in wb.sheetnames: return jsonify({'error': 'Sheet not found'}), 404
         ws = wb[sheet_name]
         
@@ -620,188 +2240,403 @@ def save_sheet_data_api():
         for r_idx, row in enumerate(data):
             for c_idx, val in enumerate(row):
                 # r_idx+1, c_idx+1 because openpyxl is 1-based
-                # Try to preserve types if possible? Everything is str from JSON.
-                # Try converting to int/float if it looks like one
-                clean_val = val
-                if isinstance(val, str):
-                    val = val.strip()
-                    if val.replace('.','',1).isdigit():
-                        try:
-                            if '.' in val: clean_val = float(val)
-                            else: clean_val = int(val)
-                        except: clean_val = val
-                    elif val == "":
-                        clean_val = None
+                ws.cell(row=r_idx+1, column=c_idx+1, value=_editor_value(val))
                 
-                ws.cell(row=r_idx+1, column=c_idx+1, value=clean_val)
-                
-        wb.save(FILE_NAME)
+        save_workbook(wb)
         wb.close()
+        LEDGER_CACHE.invalidate(sheet_name)
         # SYNC TO CLOUD
         if USE_CLOUD_STORAGE: sync_up()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- CELL PATCHES (Excel editor saves) ---
+# When the client edited the version it is patching, no conflicts are possible and the
+# changed cells are spliced straight into the sheet's XML part: the rest of the sheet and
+# workbook is copied byte-for-byte, so cost follows the number of edits. Anything the
+# splicer doesn't handle (shared/array formula masters, calcChain, rows without r=...)
+# and stale-version patches go through openpyxl with a per-cell conflict check instead.
+_ROW_RE = re.compile(rb'<row\b([^>]*?)(/?)>')
+_CELL_RE = re.compile(rb'<c\b([^>]*?)(/?)>')
+_ATTR_R_RE = re.compile(rb'\sr="([A-Z]*)(\d+)"')
+_ATTR_S_RE = re.compile(rb'\ss="(\d+)"')
+_FORMULA_CACHE_RE = re.compile(rb'(<f\b[^>]*/>|<f\b[^>]*>[^<]*</f>)<v>[^<]*</v>|(<f\b[^>]*/>|<f\b[^>]*>[^<]*</f>)<v\s*/>')
+
+class _PatchUnsupported(Exception):
+    pass
+
+def _element_end(xml, match, close_tag):
+    """End offset of the element whose start tag is match (self-closing or not)."""
+    if match.group(2): return match.end()
+    end = xml.find(close_tag, match.end())
+    if end < 0: raise _PatchUnsupported("unterminated element")
+    return end + len(close_tag)
+
+def _cell_xml(coord, style, value):
+    attrs = f' r="{coord}"' + (f' s="{style}"' if style else '')
+    if value is None:
+        return f'<c{attrs}/>' if style else ''
+    if isinstance(value, bool):
+        return f'<c{attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c{attrs}><v>{value}</v></c>'
+    text = str(value)
+    if text.startswith('='):
+        return f'<c{attrs}><f>{xml_escape(text[1:])}</f></c>'
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c{attrs} t="inlineStr"><is><t{space}>{xml_escape(text)}</t></is></c>'
+
+def _patch_row(row_xml, row_num, edits):
+    """Applies {col: value} to one <row> element (bytes); returns the new element."""
+    start = _ROW_RE.match(row_xml)
+    if start.group(2): # <row .../> -> open it up
+        head, body, tail = row_xml[:-2] + b'>', b'', b'</row>'
+    else:
+        head, body, tail = row_xml[:start.end()], row_xml[start.end():-len(b'</row>')], b'</row>'
+
+    out, pos = [], 0
+    pending = sorted(edits.items())
+    for m in _CELL_RE.finditer(body):
+        ref = _ATTR_R_RE.search(m.group(1))
+        if not ref: raise _PatchUnsupported("cell without r attribute")
+        col = xl_cell.column_index_from_string(ref.group(1).decode())
+        end = _element_end(body, m, b'</c>')
+        while pending and pending[0][0] < col:
+            c, value = pending.pop(0)
+            out.append(body[pos:m.start()]); pos = m.start()
+            out.append(_cell_xml(f"{xl_cell.get_column_letter(c)}{row_num}", None, value).encode())
+        if pending and pending[0][0] == col:
+            cell = body[m.start():end]
+            if re.search(rb'<f\b[^>]*\bt="(shared|array)"[^>]*\bref=', cell):
+                raise _PatchUnsupported("shared/array formula master")
+            style = _ATTR_S_RE.search(m.group(1))
+            out.append(body[pos:m.start()])
+            out.append(_cell_xml(f"{xl_cell.get_column_letter(col)}{row_num}", style and style.group(1).decode(), pending.pop(0)[1]).encode())
+            pos = end
+    out.append(body[pos:])
+    for c, value in pending:
+        out.append(_cell_xml(f"{xl_cell.get_column_letter(c)}{row_num}", None, value).encode())
+    return head + b''.join(out) + tail
+
+def _patch_sheet_xml(xml, edits):
+    """Splices {(row, col): value} into a worksheet part; returns the new bytes."""
+    data_start = re.search(rb'<sheetData\s*(/?)>', xml)
+    if not data_start: raise _PatchUnsupported("no sheetData")
+    if data_start.group(1):
+        xml = xml[:data_start.start()] + b'<sheetData></sheetData>' + xml[data_start.end():]
+        data_start = re.search(rb'<sheetData\s*>', xml)
+    data_end = xml.find(b'</sheetData>', data_start.end())
+
+    by_row = {}
+    for (r, c), value in edits.items(): by_row.setdefault(r, {})[c] = value
+    pending = sorted(by_row.items())
+
+    out, pos = [xml[:data_start.end()]], data_start.end()
+    for m in _ROW_RE.finditer(xml, data_start.end(), data_end):
+        ref = re.search(rb'\sr="(\d+)"', m.group(1))
+        if not ref: raise _PatchUnsupported("row without r attribute")
+        row_num = int(ref.group(1))
+        end = _element_end(xml, m, b'</row>')
+        while pending and pending[0][0] < row_num:
+            r, cols = pending.pop(0)
+            out.append(xml[pos:m.start()]); pos = m.start()
+            out.append(_patch_row(f'<row r="{r}"/>'.encode(), r, cols))
+        if pending and pending[0][0] == row_num:
+            out.append(xml[pos:m.start()])
+            out.append(_patch_row(xml[m.start():end], row_num, pending.pop(0)[1]))
+            pos = end
+    out.append(xml[pos:data_end])
+    for r, cols in pending:
+        out.append(_patch_row(f'<row r="{r}"/>'.encode(), r, cols))
+    out.append(xml[data_end:])
+    xml = b''.join(out)
+
+    # Drop cached formula results (as an openpyxl save does); Excel recalculates on open
+    xml = _FORMULA_CACHE_RE.sub(lambda m: m.group(1) or m.group(2), xml)
+
+    # Grow <dimension> to cover new cells
+    dim = re.search(rb'<dimension ref="([^"]+)"\s*/>', xml)
+    if dim:
+        min_col, min_row, max_col, max_row = xl_cell.range_boundaries(dim.group(1).decode())
+        rows = [r for r, _ in edits] + [min_row, max_row]
+        cols = [c for _, c in edits] + [min_col, max_col]
+        ref = f"{xl_cell.get_column_letter(min(cols))}{min(rows)}:{xl_cell.get_column_letter(max(cols))}{max(rows)}"
+        xml = xml[:dim.start(1)] + ref.encode() + xml[dim.end(1):]
+    return xml
+
+def _splice_patch(sheet_name, edits):
+    meta = get_workbook_meta()
+    part = next((s['part'] for s in meta['sheets'] if s['name'] == sheet_name), None) if meta else None
+    if not part: raise _PatchUnsupported("sheet part not found")
+    with zipfile.ZipFile(FILE_NAME) as zin:
+        if 'xl/calcChain.xml' in zin.namelist(): raise _PatchUnsupported("workbook has a calcChain")
+        new_xml = _patch_sheet_xml(zin.read(part), edits)
+        # Never write a part Excel (or openpyxl) can't read back; openpyxl re-checks the edits
+        try: expat.ParserCreate().Parse(new_xml, True)
+        except expat.ExpatError as e: raise _PatchUnsupported(f"patched sheet XML is not well-formed: {e}")
+        with atomic_write(FILE_NAME) as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                zout.writestr(info, new_xml if info.filename == part else zin.read(info))
+
+def _openpyxl_patch(sheet_name, changes):
+    """Applies changes whose 'old' still matches; returns the conflicting ones."""
+    with timed('wb_open'): wb = openpyxl.load_workbook(FILE_NAME)
+    try:
+        ws = wb[sheet_name]
+        conflicts = []
+        for ch in changes:
+            cell = ws.cell(row=ch['row']+1, column=ch['col']+1)
+            current = _editor_text(cell.value)
+            if 'old' in ch and str(ch['old'] if ch['old'] is not None else "") != current:
+                conflicts.append(dict(ch, current=current))
+                continue
+            cell.value = _editor_value(ch['new'])
+        if len(conflicts) < len(changes):
+            save_workbook(wb)
+        return conflicts
+    finally:
+        wb.close()
+
+@app.route('/api/patch_sheet_data', methods=['POST'])
+@workbook_writer
+def patch_sheet_data_api():
+    """Applies a batch of {row, col, old, new} cell edits (0-based, as Jspreadsheet reports
+    them). 'version' is the token /api/sheet_data returned when the client loaded the sheet."""
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        req = request.json
+        sheet_name = req.get('sheet_name')
+        changes = req.get('changes') or []
+        if not sheet_name or not changes: return jsonify({'error': 'Missing data'}), 400
+        if sheet_name not in get_all_sheet_names(): return jsonify({'error': 'Sheet not found'}), 404
+        try:
+            changes = [dict(ch, row=int(ch['row']), col=int(ch['col'])) for ch in changes]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each change needs row, col and new'}), 400
+        if any(ch['row'] < 0 or ch['col'] < 0 or 'new' not in ch for ch in changes):
+            return jsonify({'error': 'Each change needs row, col and new'}), 400
+        # Both write paths must see the same values: the splice would store str() of a
+        # list or dict, openpyxl refuses it
+        invalid = [{'row': ch['row'], 'col': ch['col']} for ch in changes
+                   if ch['new'] is not None and not isinstance(ch['new'], (str, int, float, bool))]
+        if invalid: return jsonify({'error': 'Cell values must be text, numbers, booleans or null', 'cells': invalid}), 400
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        illegal = [{'row': ch['row'], 'col': ch['col']} for ch in changes
+                   if isinstance(ch['new'], str) and ILLEGAL_CHARACTERS_RE.search(ch['new'])]
+        if illegal: return jsonify({'error': 'Text contains control characters a workbook cannot store', 'cells': illegal}), 400
+
+        conflicts = []
+        spliced = False
+        if req.get('version') and req.get('version') == workbook_token():
+            # Nobody has written since the client loaded the sheet: every 'old' still holds
+            edits = {(ch['row']+1, ch['col']+1): _editor_value(ch['new']) for ch in changes}
+            try:
+                with timed('save'): _splice_patch(sheet_name, edits)
+                spliced = True
+            except _PatchUnsupported as e:
+                log.debug(f"Cell patch falling back to openpyxl ({e})")
+        if not spliced:
+            conflicts = _openpyxl_patch(sheet_name, changes)
+
+        if len(conflicts) < len(changes):
+            LEDGER_CACHE.invalidate(sheet_name)
+            # SYNC TO CLOUD
+            if USE_CLOUD_STORAGE: sync_up()
+        return jsonify({
+            'success': True,
+            'applied': len(changes) - len(conflicts),
+            'conflicts': conflicts,
+            'version': workbook_token()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/toggle-pay', methods=['POST'])
 def toggle_pay():
     if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
     item_id = request.json.get('id')
     if not item_id: return jsonify({'error': 'No ID'}), 400
-    db = load_paid_db()
-    current_entry = db.get(item_id)
-    if current_entry:
-        del db[item_id]
-        new_status = False
-        paid_on = None
-    else:
-        # Changed: Use local server time instead of UTC to fix user reported time mistake.
-        now = datetime.now().strftime("%d %b, %I:%M %p")
-        db[item_id] = now
-        new_status = True
-        paid_on = now
-    save_paid_db(db)
-    return jsonify({'success': True, 'new_status': new_status, 'paid_on': paid_on})
-
-@app.route('/download_excel')
-def download_excel():
-    if 'user' not in session: return redirect(url_for('login_page'))
-    
-    # 1. Get processed data
-    members = get_excel_data() 
-    
-    # 2. Create Workbook using openpyxl directly for formatting
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Payment Receipts"
-    
-    # Styles
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    # Changed: Use local server time instead of UTC to fix user reported time mistake.
+    now = datetime.now().strftime("%d %b, %I:%M %p")
+    with timed('payments'): paid_on = PAYMENTS.toggle(item_id, now)
+    new_status = paid_on is not None
+
+    # Delta for the card(s) holding this item, from the cached ledger the toggle just patched
+    ledger = get_ledger(request.json.get('sheet'))
+    members = [m.to_dict(('payment_id', 'key', 'total', 'paid_amount', 'is_paid'))
+               for m in (ledger.members_for(item_id) if ledger else [])]
+    return jsonify({'success': True, 'new_status': new_status, 'paid_on': paid_on, 'members': members})
+
+BULK_PAY_MAX_ITEMS = 5000
+
+@app.route('/api/bulk-pay', methods=['POST'])
+def bulk_pay():
+    """Marks many items paid (or unpaid) with one timestamp and one journal write.
+    Body: {sheet, paid: true|false, and one of ids: [...], member: key, area: name}.
+    member is the member's key (normalized name + area); payment_id is not unique."""
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    body = request.get_json(silent=True) or {}
+    ids, member, area = body.get('ids'), body.get('member'), body.get('area')
+    if sum(x is not None for x in (ids, member, area)) != 1:
+        return jsonify({'error': 'Give exactly one of ids, member or area'}), 400
+    paid = body.get('paid', True)
+    if not isinstance(paid, bool): return jsonify({'error': 'paid must be true or false'}), 400
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, str) and i for i in ids)):
+        return jsonify({'error': 'ids must be a list of item ids'}), 400
+
+    ledger = get_ledger(body.get('sheet'))
+    if ids is None:
+        if not ledger: return jsonify({'error': 'Sheet not found'}), 404
+        if member is not None: selected = [m for m in ledger.members if m.key == member]
+        else: selected = [m for m in ledger.members if normalize_text(m.area) == normalize_text(area)]
+        if not selected: return jsonify({'error': 'No matching members'}), 404
+        ids = [item.id for m in selected for item in m.items]
+    if len(ids) > BULK_PAY_MAX_ITEMS:
+        return jsonify({'error': f'At most {BULK_PAY_MAX_ITEMS} items per request'}), 400
+
+    now = datetime.now().strftime("%d %b, %I:%M %p")
+    paid_on = now if paid else None
+    with timed('payments'): changed = PAYMENTS.set_many(ids, paid_on)
+
+    # Deltas for the affected cards plus the sheet totals, from the ledger the write just patched
+    ledger = get_ledger(body.get('sheet'))
+    members, totals = [], None
+    if ledger:
+        members = [ledger.members[pos].to_dict(('payment_id', 'key', 'total', 'paid_amount', 'is_paid'))
+                   for pos in ledger.positions_for(ids)]
+        sheet = ledger.summary.sheet
+        totals = {'total': sheet['total'], 'paid': sheet['collected'], 'pending': sheet['total'] - sheet['collected']}
+    return jsonify({'success': True, 'paid_on': paid_on, 'changed': len(changed), 'ids': changed,
+                    'members': members, 'totals': totals})
+
+# --- RECEIPT EXPORT ---
+# Write-only workbook: rows go straight to a temp file as they are appended, and every cell
+# refers to one of a handful of named styles instead of carrying its own Font/Border/Fill.
+def _receipt_styles():
+    from openpyxl.styles import NamedStyle, Font, Alignment, Border, Side, PatternFill
+    thin = Side(style='thin')
+    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
     header_fill = PatternFill(start_color="E0E0E0", end_color="E0E0E0", fill_type="solid") # Light Grey
     bold_font = Font(bold=True)
-    
+    money = '#,##0.00'
+    return [
+        NamedStyle('receipt_label', font=bold_font, border=thin_border),
+        NamedStyle('receipt_date', font=bold_font, border=thin_border, alignment=Alignment(horizontal='right')),
+        NamedStyle('receipt_header', fill=header_fill, border=thin_border),
+        NamedStyle('receipt_cell', border=thin_border),
+        NamedStyle('receipt_money', border=thin_border, number_format=money),
+        NamedStyle('receipt_spacer', fill=header_fill),
+        NamedStyle('receipt_total_label', font=bold_font, fill=header_fill, border=thin_border),
+        NamedStyle('receipt_total', font=bold_font, fill=header_fill, border=thin_border, number_format=money),
+    ]
+
+def _receipt_number(val):
+    # Plan/commission are printed as numbers when they look like one
+    try: return float(str(val).replace(',',''))
+    except (TypeError, ValueError): return val
+
+def write_receipts_xlsx(members, fileobj):
+    """Writes the 'Payment Receipts' workbook for members into fileobj."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    for style in _receipt_styles(): wb.add_named_style(style)
+    ws = wb.create_sheet("Payment Receipts")
+
     # Column Widths
     ws.column_dimensions['A'].width = 15 # Month / Label
     ws.column_dimensions['B'].width = 25 # Plan / Name
     ws.column_dimensions['C'].width = 25 # Comm / Area
     ws.column_dimensions['D'].width = 20 # Amount
-    
-    row_idx = 1
-    
+
+    def cell(value, style):
+        c = WriteOnlyCell(ws, value=value)
+        c.style = style # One of the named styles registered above
+        return c
+
+    header_row = [cell(h, 'receipt_header') for h in ("Month", "Plan", "Commission", "Amount")]
+    spacer_row = [cell(None, 'receipt_spacer') for _ in range(4)]
+    today = datetime.now().strftime("%d-%b-%Y")
+
     for m in members:
-        # Sort out date
-        display_date = m.get('paid_date', datetime.now().strftime("%d-%b-%Y"))
-        if not display_date: display_date = datetime.now().strftime("%d-%b-%Y")
-        
-        # --- ROW 1: Header Block [Name Label | Name | Area | Date] ---
-        # Cell A: Name Label
-        c1 = ws.cell(row=row_idx, column=1, value="Name")
-        c1.font = bold_font
-        c1.border = thin_border
-        
-        # Cell B: Name Value
-        c2 = ws.cell(row=row_idx, column=2, value=m['name'])
-        c2.font = bold_font
-        c2.border = thin_border
-        
-        # Cell C: Area Value
-        c3 = ws.cell(row=row_idx, column=3, value=m['area'])
-        c3.font = bold_font
-        c3.border = thin_border
-        
-        # Cell D: Date
-        c4 = ws.cell(row=row_idx, column=4, value=display_date)
-        c4.font = bold_font
-        c4.alignment = Alignment(horizontal='right')
-        c4.border = thin_border
-        
-        row_idx += 1
-        
-        # --- ROW 2: Column Headers [Month | Plan | Commission | Amount] ---
-        headers = ["Month", "Plan", "Commission", "Amount"]
-        for col_num, h_text in enumerate(headers, 1):
-            c = ws.cell(row=row_idx, column=col_num, value=h_text)
-            c.fill = header_fill
-            c.border = thin_border
-        row_idx += 1
-        
-        # --- ROW 3+: Items ---
-        items_to_print = m['items'] if m['items'] else [{'month': '-', 'plan': '-', 'commission': '-', 'amount': m['total']}]
-        
+        display_date = m.paid_date or today
+
+        # Header Block [Name Label | Name | Area | Date]
+        ws.append([cell("Name", 'receipt_label'), cell(m.name, 'receipt_label'),
+                   cell(m.area, 'receipt_label'), cell(display_date, 'receipt_date')])
+        # Column Headers [Month | Plan | Commission | Amount]
+        ws.append(header_row)
+
+        items_to_print = m.items or [LedgerItem('-', '-', '-', m.total, None, None)]
         for item in items_to_print:
-            # Month
-            ws.cell(row=row_idx, column=1, value=item.get('month', '-')).border = thin_border
-            # Plan
-            # Try to format as number if possible
-            plan_val = item.get('plan', '-')
-            try: plan_val = float(str(plan_val).replace(',','')) 
-            except: pass
-            c_plan = ws.cell(row=row_idx, column=2, value=plan_val)
-            c_plan.border = thin_border
-            if isinstance(plan_val, (int, float)): c_plan.number_format = '#,##0.00'
-            
-            # Commission
-            comm_val = item.get('commission', '-')
-            try: comm_val = float(str(comm_val).replace(',','')) 
-            except: pass
-            c_comm = ws.cell(row=row_idx, column=3, value=comm_val)
-            c_comm.border = thin_border
-            if isinstance(comm_val, (int, float)): c_comm.number_format = '#,##0.00'
-
-            # Amount
-            amt_val = item.get('amount', 0)
-            c_amt = ws.cell(row=row_idx, column=4, value=amt_val)
-            c_amt.border = thin_border
-            c_amt.number_format = '#,##0.00'
-            
-            row_idx += 1
-            
-        # --- ROW N: Empty spacers (to match image style roughly) ---
-        # Image shows some empty grey rows or just space? 
-        # Image has 2 empty rows with grey background before Total. Let's add 1 empty row.
-        for col_num in range(1, 5):
-             ws.cell(row=row_idx, column=col_num).fill = header_fill
-             ws.cell(row=row_idx+1, column=col_num).fill = header_fill
-        row_idx += 2
-
-        # --- ROW Footer: Total Payable ---
-        c_foot_label = ws.cell(row=row_idx, column=1, value="Total Payable")
-        c_foot_label.font = bold_font
-        c_foot_label.fill = header_fill
-        c_foot_label.border = thin_border
-        
-        # Merge B and C for footer or just leave empty? Image shows total at right.
-        ws.cell(row=row_idx, column=2).fill = header_fill
-        ws.cell(row=row_idx, column=2).border = thin_border
-        ws.cell(row=row_idx, column=3).fill = header_fill
-        ws.cell(row=row_idx, column=3).border = thin_border
-        
-        c_foot_val = ws.cell(row=row_idx, column=4, value=m['total'])
-        c_foot_val.font = bold_font
-        c_foot_val.fill = header_fill
-        c_foot_val.border = thin_border
-        c_foot_val.number_format = '#,##0.00'
-        
-        row_idx += 1
-        
+            plan_val = _receipt_number(item.plan)
+            comm_val = _receipt_number(item.commission)
+            ws.append([
+                cell(item.month, 'receipt_cell'),
+                cell(plan_val, 'receipt_money' if isinstance(plan_val, float) else 'receipt_cell'),
+                cell(comm_val, 'receipt_money' if isinstance(comm_val, float) else 'receipt_cell'),
+                cell(item.amount, 'receipt_money')
+            ])
+
+        # Two grey spacer rows, then Total Payable
+        ws.append(spacer_row)
+        ws.append(spacer_row)
+        ws.append([cell("Total Payable", 'receipt_total_label'), cell(None, 'receipt_header'),
+                   cell(None, 'receipt_header'), cell(m.total, 'receipt_total')])
+
         # Spacer between members
-        row_idx += 3
+        for _ in range(3): ws.append([])
+
+    wb.save(fileobj)
+
+@app.route('/download_excel')
+def download_excel():
+    if 'user' not in session: return redirect(url_for('login_page'))
+
+    # 1. Get processed data
+    ledger = get_ledger(request.args.get('sheet'))
+    members = ledger.members if ledger else []
 
-    # Save to BytesIO
-    output = io.BytesIO()
-    wb.save(output)
+    # 2. Build into a temp file and stream it from disk
+    output = tempfile.TemporaryFile()
+    with timed('export'): write_receipts_xlsx(members, output)
     output.seek(0)
-    
+
     filename = f"Payment_Receipts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     return send_file(output, download_name=filename, as_attachment=True, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
 from itertools import groupby
 
+RECEIPTS_PER_PAGE = int(os.environ.get('RECEIPTS_PER_PAGE', 120)) # Members per page; pages hold whole areas
+RECEIPT_STREAM_BUFFER = 200 # Template events per streamed chunk (a receipt is ~30)
+
+def receipt_pages(members):
+    """Members (sorted by area) split into pages of whole areas, each about RECEIPTS_PER_PAGE
+    members. An area larger than that gets a page to itself."""
+    pages, page = [], []
+    for _, group in groupby(members, key=lambda m: str(m.area).strip().lower()):
+        group = list(group)
+        if page and len(page) + len(group) > RECEIPTS_PER_PAGE:
+            pages.append(page)
+            page = []
+        page.extend(group)
+    if page: pages.append(page)
+    return pages
+
+def stream_page(template_name, **context):
+    """Renders a template as it is sent, RECEIPT_STREAM_BUFFER events at a time, so the
+    browser starts drawing before the loops in it finish."""
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(RECEIPT_STREAM_BUFFER)
+    return Response(stream_with_context(stream), mimetype='text/html')
+
 @app.route('/view_receipts')
 def view_receipts():
+    """Printable receipts, sorted by area and name and streamed as they render.
+    Optional: sheet, area (one area only), page (1-based, whole areas per page)."""
     if 'user' not in session: return redirect(url_for('login_page'))
     
     sheet_names = get_all_sheet_names()
@@ -810,25 +2645,179 @@ def view_receipts():
     if not target_sheet and sheet_names:
         target_sheet = sheet_names[0]
     
-    data_response = get_excel_data(target_sheet)
-    # Handle dict response
-    if isinstance(data_response, dict):
-        members = data_response.get('members', [])
-    else:
-        members = data_response
+    ledger = get_ledger(target_sheet)
+    members = ledger.members if ledger else []
+    area = request.args.get('area')
+    if area: members = [m for m in members if normalize_text(m.area) == normalize_text(area)]
     
     # Sort by Area (primary) and Name (secondary)
+    # (sorted() rather than .sort(): the list is shared with the ledger cache)
     def sort_key(x):
-        return (str(x.get('area', '')).strip().lower(), str(x.get('name', '')).strip().lower())
+        return (str(x.area).strip().lower(), str(x.name).strip().lower())
     
-    members.sort(key=sort_key)
+    members = sorted(members, key=sort_key)
+    pages = receipt_pages(members)
+    page = request.args.get('page', type=int)
+    if page: members = pages[min(max(page, 1), len(pages)) - 1] if pages else []
     
     # Continuous Layout: Return flat list, sorted by Area
-    return render_template('receipt_preview.html', 
-                           members=members, 
-                           now=datetime.now(),
-                           sheet_names=sheet_names,
-                           active_sheet=target_sheet)
+    return stream_page('receipt_preview.html', 
+                       members=members, 
+                       now=datetime.now(),
+                       sheet_names=sheet_names,
+                       active_sheet=target_sheet,
+                       areas=ledger.index.area_names if ledger else [],
+                       active_area=area or '',
+                       page_count=len(pages),
+                       active_page=page or 0)
+
+# --- CROSS-SHEET REPORT ---
+# Sheets missing from LEDGER_CACHE are parsed in parallel on a process pool (pandas parsing
+# is CPU-bound, so threads don't help). Workers get the workbook path and a payments
+# snapshot as arguments and touch no shared state; results are cached like any other load.
+# Workers are started with forkserver/spawn, never fork: a forked copy of a threaded
+# gunicorn worker can inherit a lock some other thread held and hang on it.
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', min(4, os.cpu_count() or 1)))
+REPORT_PARSE_TIMEOUT = float(os.environ.get('REPORT_PARSE_TIMEOUT', 120)) # Then parse in-process
+REPORT_POOL_IDLE_SECONDS = 300 # An unused pool is shut down (its workers exit) after this
+_report_pool = None
+_report_pool_lock = threading.Lock()
+_report_pool_timer = None
+
+def _get_report_pool():
+    """Shared process pool, created on first use and shut down after REPORT_POOL_IDLE_SECONDS
+    without use. None when disabled (REPORT_WORKERS <= 1)."""
+    global _report_pool, _report_pool_timer
+    with _report_pool_lock:
+        if _report_pool is None and REPORT_WORKERS > 1:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _report_pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=ctx)
+        if _report_pool is not None:
+            if _report_pool_timer is not None: _report_pool_timer.cancel()
+            _report_pool_timer = threading.Timer(REPORT_POOL_IDLE_SECONDS, _reset_report_pool)
+            _report_pool_timer.daemon = True
+            _report_pool_timer.start()
+        return _report_pool
+
+def _reset_report_pool(kill=False):
+    """Shuts the pool down; kill=True also terminates workers still busy (e.g. hung)."""
+    global _report_pool, _report_pool_timer
+    with _report_pool_lock:
+        pool, _report_pool = _report_pool, None
+        if _report_pool_timer is not None: _report_pool_timer.cancel()
+        _report_pool_timer = None
+    if pool is None: return
+    processes = list((getattr(pool, '_processes', None) or {}).values()) if kill else []
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes: process.terminate()
+
+atexit.register(_reset_report_pool, True)
+
+def load_ledgers(sheet_names):
+    """{sheet: ParsedLedger} for many sheets. Returns (ledgers, number of sheets parsed)."""
+    paid_version, paid = PAYMENTS.versioned_snapshot()
+    generation = LEDGER_CACHE.generation
+    keys = {name: (sheet_fingerprint(name), name, paid_version) for name in sheet_names}
+
+    ledgers, missing = {}, []
+    for name in sheet_names:
+        ledger = LEDGER_CACHE.peek(keys[name])
+        if ledger is None: missing.append(name)
+        else: ledgers[name] = ledger
+
+    pool = _get_report_pool() if len(missing) > 1 else None
+    parsed = {}
+    if pool is not None:
+        deadline = time.monotonic() + REPORT_PARSE_TIMEOUT
+        try:
+            futures = {name: pool.submit(_parse_excel_data, name, FILE_NAME, paid) for name in missing}
+            for name, f in futures.items(): parsed[name] = f.result(timeout=max(0, deadline - time.monotonic()))
+        except (BrokenProcessPool, CancelledError) as e:
+            log.error(f"Report pool broke, parsing in-process: {e!r}")
+            _reset_report_pool()
+        except FuturesTimeout:
+            log.error(f"Report pool took over {REPORT_PARSE_TIMEOUT}s, parsing the rest in-process")
+            _reset_report_pool(kill=True)
+    for name in missing:
+        if name not in parsed: parsed[name] = _parse_excel_data(name, FILE_NAME, paid)
+
+    for name, ledger in parsed.items():
+        LEDGER_CACHE.store(keys[name], ledger, generation)
+        ledgers[name] = ledger
+    return ledgers, len(missing)
+
+def _pct(part, whole):
+    return round(part * 100.0 / whole, 2) if whole else 0
+
+def build_report(sheet_names, ledgers):
+    """Month, member and area rollups over the given sheets (in the given order)."""
+    months, members, areas = [], {}, {}
+    for sheet_name in sheet_names:
+        ledger = ledgers[sheet_name]
+        month_total = month_paid = 0
+        for m in ledger.members:
+            total, paid = m.total, m.paid_amount
+            if total <= 0: continue
+            month_total += total
+            month_paid += paid
+
+            row = members.get(m.key)
+            if row is None:
+                row = members[m.key] = {'name': m.name, 'area': m.area, 'total': 0, 'paid': 0, 'pending_months': []}
+            row['total'] += total
+            row['paid'] += paid
+            if paid < total: row['pending_months'].append(sheet_name)
+
+            area = areas.setdefault(m.area, {'area': m.area, 'total': 0, 'paid': 0, 'members': set()})
+            area['total'] += total
+            area['paid'] += paid
+            area['members'].add(m.key)
+
+        months.append({
+            'sheet': sheet_name,
+            'members': len(ledger.members),
+            'total': month_total,
+            'paid': month_paid,
+            'pending': month_total - month_paid,
+            'paid_pct': _pct(month_paid, month_total),
+            'grand_total': ledger.grand_total
+        })
+
+    for row in members.values():
+        row['pending'] = row['total'] - row['paid']
+    for area in areas.values():
+        area['members'] = len(area['members'])
+        area['pending'] = area['total'] - area['paid']
+        area['paid_pct'] = _pct(area['paid'], area['total'])
+
+    total = sum(m['total'] for m in months)
+    paid = sum(m['paid'] for m in months)
+    return {
+        'months': months,
+        'members': sorted(members.values(), key=lambda r: (-r['pending'], r['name'])),
+        'areas': sorted(areas.values(), key=lambda a: a['area']),
+        'totals': {'total': total, 'paid': paid, 'pending': total - paid, 'paid_pct': _pct(paid, total)}
+    }
+
+@app.route('/api/report')
+def cross_sheet_report_api():
+    """Year-to-date rollups across sheets (?sheets=a,b,c; default: every sheet)."""
+    if 'user' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    all_sheets = get_all_sheet_names()
+    requested = request.args.get('sheets')
+    sheet_names = [s for s in requested.split(',') if s] if requested else all_sheets
+    unknown = [s for s in sheet_names if s not in all_sheets]
+    if unknown: return jsonify({'error': f"Unknown sheets: {', '.join(unknown)}"}), 404
+    try:
+        start = time.time()
+        ledgers, parsed = load_ledgers(sheet_names)
+        report = build_report(sheet_names, ledgers)
+        report.update(parsed=parsed, reused=len(sheet_names) - parsed, elapsed_ms=round((time.time() - start) * 1000))
+        return jsonify(report)
+    except Exception as e:
+        log.exception(f"Cross-sheet report failed: {e}")
+        return jsonify({'error': str(e)}), 500
 
 # --- REPORT ROUTES ---
 @app.route('/reports')
@@ -841,6 +2830,43 @@ def reports_page():
 def excel_editor_page():
     return render_template('excel_editor.html') if 'user' in session else redirect(url_for('login_page'))
 
+# --- STARTUP ---
+# The workbook is pulled from storage once per start, in the background, while requests are
+# served from the copy already on disk (or the seed). Writers wait for it (WORKBOOK_READY).
+# Afterwards pandas/openpyxl are imported so the first real request doesn't pay for them.
+PREWARM_IMPORTS = os.environ.get('PREWARM_IMPORTS', '1') != '0'
+STARTUP = {'import_seconds': None, 'hydration': 'pending' if USE_CLOUD_STORAGE else 'off',
+           'hydration_seconds': None, 'prewarm_seconds': None}
+
+def _startup():
+    if USE_CLOUD_STORAGE:
+        started = time.perf_counter()
+        STARTUP['hydration'] = 'running'
+        try: STARTUP['hydration'] = 'downloaded' if sync_down() else 'unchanged'
+        except Exception:
+            # Keep serving the local copy (seed or last download); /api/sync_status shows the failure
+            STARTUP['hydration'] = 'failed'
+            log.exception("Workbook hydration failed")
+        finally:
+            STARTUP['hydration_seconds'] = round(time.perf_counter() - started, 3)
+            WORKBOOK_READY.set()
+        log.info(f"Workbook hydration: {STARTUP['hydration']} in {STARTUP['hydration_seconds']}s")
+    if PREWARM_IMPORTS:
+        started = time.perf_counter()
+        for name in ('pandas', 'openpyxl'): importlib.import_module(name)
+        STARTUP['prewarm_seconds'] = round(time.perf_counter() - started, 3)
+        log.debug(f"Imported pandas/openpyxl in {STARTUP['prewarm_seconds']}s")
+
+if not USE_CLOUD_STORAGE or IS_POOL_WORKER: WORKBOOK_READY.set()
+if (USE_CLOUD_STORAGE or PREWARM_IMPORTS) and not IS_POOL_WORKER:
+    threading.Thread(target=_startup, name='startup', daemon=True).start()
+
+METRICS.gauge('chitfund_startup_seconds', 'Cold start: module import, workbook hydration and library prewarm.',
+              lambda: [((('phase', phase),), STARTUP[f'{phase}_seconds'])
+                       for phase in ('import', 'hydration', 'prewarm') if STARTUP[f'{phase}_seconds'] is not None])
+STARTUP['import_seconds'] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+log.info(f"app imported in {STARTUP['import_seconds']}s")
+
 if __name__ == '__main__':
     # Local Dev (Windows)
     app.run(debug=True)
@@ -0,0 +1,278 @@
+"""
+Benchmarks for the hot paths, run against synthetic ledgers through the Flask test client.
+
+    python benchmark.py                         # default size, compared with benchmark_baseline.json
+    python benchmark.py --members 800 --plans 18 --months 12 --repeat 5
+    python benchmark.py --save-baseline         # store this run as the baseline for its size
+    python benchmark.py --keep out.xlsx         # also keep the generated workbook
+
+Everything runs in a temporary directory (workbook, payment journal, sheet sidecars), with
+cloud storage disabled, so the real data files are never touched. Times are the median of
+--repeat runs; peak memory is measured in one extra run under tracemalloc.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+FIRST_NAMES = ['SOHANJI', 'SURESH', 'JIVARAMJI', 'BHAWARJI', 'MANGILALJI', 'NETHIRAMJI', 'KISHANJI',
+               'TARARAMJI', 'PUKHRAJ', 'CHAMPALAL', 'BABULAL', 'DINESH', 'MAHENDRA', 'PRAKASH',
+               'RAMESH', 'GANPAT', 'HEERALAL', 'OMPRAKASH', 'BHERULAL', 'KANHAIYALAL']
+AREAS = ['ALWN.CO', 'JODHPUR', 'YAMJAL', 'BAJPLY', 'BOLARAM', 'RAMARAM', 'KAMAN', 'PRGATI NG']
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+BLOCK_ROWS = 9 # NAME, header, up to 5 months, Total Payable, blank
+MAX_ITEMS = 5
+
+# --- SYNTHETIC LEDGER ---
+def sheet_names(months, year=2026, month=3):
+    """Newest first, like the real workbook (run_auction_batch puts the new month in front)."""
+    names = []
+    for _ in range(months):
+        names.append(f"{MONTH_NAMES[month - 1]}{year}")
+        month -= 1
+        if month == 0: month, year = 12, year - 1
+    return names
+
+def make_plans(plans):
+    """Plan amounts: 2.5L steps, like the 2.5L/5L/10L/20L chits in the sample."""
+    return [250000 * (k + 1) for k in range(plans)]
+
+def make_members(members, plans, rng):
+    out = []
+    for i in range(members):
+        name = rng.choice(FIRST_NAMES) + (f" ({i // len(FIRST_NAMES) + 1})" if i >= len(FIRST_NAMES) else "")
+        items = [(rng.choice([21, 18, 15, 10, 5]), rng.choice(plans), rng.choice([0, 0, 0, 1500]))
+                 for _ in range(rng.randint(1, MAX_ITEMS))]
+        out.append({'name': name, 'area': rng.choice(AREAS), 'items': items})
+    return out
+
+def write_sheet(ws, members, plans, date):
+    """One month in the layout get_excel_data() / get_auction_plans() / run_auction_batch expect."""
+    # Ledger blocks: first half of the members in A-D, second half in F-I
+    half = (len(members) + 1) // 2
+    summary_row = 3
+    for group, col in ((members[:half], 1), (members[half:], 6)):
+        for b, m in enumerate(group):
+            top = 1 + b * BLOCK_ROWS
+            for offset, value in enumerate(['Name' if b % 2 else 'NAME', m['name'], m['area'], date]):
+                ws.cell(row=top, column=col + offset, value=value)
+            for offset, value in enumerate(['Month', 'Plan', 'Commission', 'Amount']):
+                ws.cell(row=top + 1, column=col + offset, value=value)
+            total = commission = 0
+            for i, (month, plan, comm) in enumerate(m['items']):
+                amount = int((plan - comm) / 20)
+                for offset, value in enumerate([month, plan, comm, amount]):
+                    ws.cell(row=top + 2 + i, column=col + offset, value=value)
+                total += amount
+                commission += comm
+            foot = top + 2 + MAX_ITEMS
+            ws.cell(row=foot, column=col, value='Total Payable')
+            ws.cell(row=foot, column=col + 2, value=commission)
+            ws.cell(row=foot, column=col + 3, value=total)
+
+            # Summary area: amount / name / area per block (T-V for A-D, X-Z for F-I)
+            s_col = 20 if col == 1 else 24
+            r = summary_row + b
+            ws.cell(row=r, column=s_col, value=f"={get_column_letter(col + 3)}{foot}")
+            ws.cell(row=r, column=s_col + 1, value=f"={get_column_letter(col + 1)}{top}")
+            ws.cell(row=r, column=s_col + 2, value=f"={get_column_letter(col + 2)}{top}")
+    for col, label in ((20, 'AMOUNT'), (21, ' NAME'), (22, 'AREA'), (24, 'AMOUNT'), (25, 'NAME'), (26, 'AREA')):
+        ws.cell(row=2, column=col, value=label)
+
+    # Auction list (L-R), one row per plan/month, then TOTAL and the trusted grand total at O23
+    for offset, value in enumerate(['Month', 'Plan Amt', 'Total Commission', None, 'Commission', 'Month|Plan', 'Amount']):
+        if value: ws.cell(row=2, column=12 + offset, value=value)
+    for i, plan in enumerate(plans):
+        r = 3 + i
+        month = [15, 10, 21, 18, 5][i % 5]
+        for offset, value in enumerate([month, plan, 0, f'=L{r}&"|"&M{r}', 0, f'=L{r}&"|"&M{r}', plan // 20]):
+            ws.cell(row=r, column=12 + offset, value=value)
+    total_row = max(21, 3 + len(plans) + 1)
+    ws.cell(row=total_row, column=14, value='TOTAL')
+    ws.cell(row=total_row, column=17, value='TOTAL')
+    grand_total = sum(sum(int((p - c) / 20) for _, p, c in m['items']) for m in members)
+    ws.cell(row=total_row + 2, column=15, value=grand_total)
+    ws.cell(row=total_row + 3, column=14, value='GRAND TOTAL')
+
+def generate_workbook(path, members=300, plans=15, months=3, seed=1):
+    """Writes a synthetic ledger workbook with one sheet per month (newest first)."""
+    rng = random.Random(seed)
+    plan_values = make_plans(plans)
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for name in sheet_names(months):
+        # Same people every month; their items drift a little
+        month_members = make_members(members, plan_values, random.Random(rng.random()))
+        write_sheet(wb.create_sheet(name), month_members, plan_values, '2026-01-14')
+    wb.save(path)
+
+# --- RUNNER ---
+def load_app(workdir):
+    """Imports app.py with its data files redirected into workdir."""
+    for var in ('K_SERVICE', 'SUPABASE_URL', 'STORAGE_BACKEND'): os.environ.pop(var, None)
+    os.environ['SIDECAR_DIR'] = os.path.join(workdir, '.sheet_cache')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(workdir) # payment_records.json / .log are relative paths
+    sys.path.insert(0, BASE_DIR)
+    import app as app_module
+    return app_module
+
+def measure(fn, setup=None, repeat=3):
+    """Median/min wall time over repeat runs, plus peak traced memory of one more run."""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    if setup: setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'median_ms': round(statistics.median(times), 2), 'min_ms': round(min(times), 2),
+            'peak_kb': round(peak / 1024, 1)}
+
+def measure_import(repeat):
+    """Cold start: importing app.py in a fresh interpreter, as a new worker does before it
+    can serve (the background hydration/prewarm thread is not included)."""
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, PREWARM_IMPORTS='0')
+    cmd = [sys.executable, '-c', 'import app']
+    return measure(lambda: subprocess.run(cmd, env=env, check=True), repeat=repeat)
+
+def run_benchmarks(app_module, workbook, repeat):
+    app = app_module.app
+    # Workbook, payment files and their locks all in the work dir, as in conftest.py
+    workdir = os.getcwd()
+    app_module.FILE_NAME = os.path.join(workdir, 'data.xlsx')
+    app_module.WORKBOOK_FILE_LOCK = app_module.FileLock(app_module.FILE_NAME + '.lock')
+    app_module.PAYMENTS = app_module.PaymentStore(
+        os.path.join(workdir, app_module.PAID_DB_FILE), os.path.join(workdir, app_module.PAID_LOG_FILE),
+        lock_path=os.path.join(workdir, app_module.PAID_LOCK_FILE))
+    app_module.PAYMENTS.listeners.append(app_module.LEDGER_CACHE.apply_payment)
+    client = app.test_client()
+    with client.session_transaction() as s: s['user'] = 'admin'
+
+    def fresh_workbook():
+        shutil.copy(workbook, app_module.FILE_NAME)
+        app_module.LEDGER_CACHE.invalidate()
+        shutil.rmtree(app_module.SIDECAR_DIR, ignore_errors=True)
+
+    def check(resp):
+        if resp.status_code >= 400: raise RuntimeError(f"{resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+        return resp
+
+    fresh_workbook()
+    sheet = app_module.get_all_sheet_names()[0]
+    results = {'import app (cold)': measure_import(repeat)}
+
+    # Reads
+    results['get_excel_data (cold)'] = measure(
+        lambda: check(client.get('/api/members', query_string={'sheet': sheet})), setup=fresh_workbook, repeat=repeat)
+    results['get_excel_data (warm)'] = measure(
+        lambda: check(client.get('/api/members', query_string={'sheet': sheet})), repeat=repeat)
+    results['get_auction_plans'] = measure(lambda: check(client.get('/auction')), repeat=repeat)
+    results['download_excel'] = measure(lambda: check(client.get('/download_excel')).get_data(), repeat=repeat)
+
+    # Payments
+    fresh_workbook()
+    items = [i['id'] for m in app_module.get_excel_data(sheet)['members'] for i in m['items']]
+    toggles = iter(items * (repeat + 2))
+    results['toggle_pay'] = measure(
+        lambda: check(client.post('/api/toggle-pay', json={'id': next(toggles), 'sheet': sheet})), repeat=repeat)
+
+    # Writes (each run starts from the generated workbook)
+    plans = app_module.get_auction_plans()[:5]
+    form = {'global_date': '2026-04-14', 'sheet_name': 'bench'}
+    for p in plans:
+        form[f"bid_for_{p['id']}"] = str(p['plan_value'] // 10)
+        form[f"new_month_for_{p['id']}"] = '20'
+    def auction():
+        resp = client.post('/run-auction-batch', data=form)
+        if resp.status_code != 302: raise RuntimeError(resp.get_data(as_text=True)[:200]) # Errors come back as 200 text
+    results['run_auction_batch'] = measure(auction, setup=fresh_workbook, repeat=repeat)
+
+    fresh_workbook()
+    grid = json.loads(check(client.get('/api/sheet_data', query_string={'sheet': sheet})).get_data())['data']
+    grid[3][1] = 'edited'
+    results['save_sheet_data_api'] = measure(
+        lambda: check(client.post('/api/save_sheet_data', json={'sheet_name': sheet, 'data': grid})),
+        setup=fresh_workbook, repeat=repeat)
+    return results
+
+# --- REPORT ---
+def compare(results, baseline, threshold, min_delta_ms):
+    """Prints a table against the baseline; returns the names that regressed past threshold."""
+    regressions = []
+    print(f"{'benchmark':<26}{'median ms':>11}{'baseline':>11}{'ratio':>8}{'peak KB':>11}{'baseline':>11}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        ratio = r['median_ms'] / base['median_ms'] if base and base['median_ms'] else None
+        flag = ''
+        # Sub-millisecond paths jitter by more than any threshold; require a real difference too
+        if ratio and ratio > 1 + threshold and r['median_ms'] - base['median_ms'] > min_delta_ms:
+            flag = '  <-- slower'
+            regressions.append(name)
+        print(f"{name:<26}{r['median_ms']:>11.1f}{(base['median_ms'] if base else float('nan')):>11.1f}"
+              f"{(ratio if ratio else float('nan')):>8.2f}{r['peak_kb']:>11.0f}"
+              f"{(base['peak_kb'] if base else float('nan')):>11.0f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=300, help='members per sheet')
+    parser.add_argument('--plans', type=int, default=15, help='plans in the auction list')
+    parser.add_argument('--months', type=int, default=3, help='sheets (months) in the workbook')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=5, help='ignore slowdowns smaller than this')
+    parser.add_argument('--keep', help='copy the generated workbook here')
+    args = parser.parse_args()
+
+    config = f"members={args.members},plans={args.plans},months={args.months}"
+    workdir = tempfile.mkdtemp(prefix='chitfund-bench-')
+    try:
+        workbook = os.path.join(workdir, 'generated.xlsx')
+        start = time.perf_counter()
+        generate_workbook(workbook, args.members, args.plans, args.months, args.seed)
+        print(f"Generated {config} in {time.perf_counter() - start:.1f}s")
+        if args.keep: shutil.copy(workbook, args.keep)
+
+        app_module = load_app(workdir)
+        results = run_benchmarks(app_module, workbook, args.repeat)
+    finally:
+        os.chdir(BASE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f: baselines = json.load(f)
+    regressions = compare(results, baselines.get(config, {}), args.threshold, args.min_delta_ms)
+
+    if args.save_baseline:
+        baselines[config] = results
+        with open(BASELINE_FILE, 'w') as f: json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline for {config} saved to {os.path.basename(BASELINE_FILE)}")
+    elif regressions:
+        print(f"Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import os
+import shutil
+
+import pytest
+
+# Tests run against local files only: no cloud storage, no background pre-imports
+for key in ('K_SERVICE', 'SUPABASE_URL', 'STORAGE_BACKEND'): os.environ.pop(key, None)
+os.environ['PREWARM_IMPORTS'] = '0'
+
+import app as app_module
+
+SAMPLE_WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_gemini.xlsx')
+
+# Scripts that drive a running server by hand, not pytest tests
+collect_ignore = ['test_download.py', 'test_excel_writer.py']
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    """A copy of sample_gemini.xlsx as the live workbook, with payments and caches in tmp_path."""
+    path = str(tmp_path / 'data.xlsx')
+    shutil.copy(SAMPLE_WORKBOOK, path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app_module, 'FILE_NAME', path)
+    monkeypatch.setattr(app_module, 'SIDECAR_DIR', str(tmp_path / '.sheet_cache'))
+    monkeypatch.setattr(app_module, 'WORKBOOK_FILE_LOCK', app_module.FileLock(path + '.lock'))
+    payments = app_module.PaymentStore(app_module.PAID_DB_FILE, app_module.PAID_LOG_FILE)
+    payments.listeners.append(app_module.LEDGER_CACHE.apply_payment)
+    monkeypatch.setattr(app_module, 'PAYMENTS', payments)
+    app_module.LEDGER_CACHE.invalidate()
+    app_module.WORKBOOK_READY.set()
+    return path
+
+@pytest.fixture
+def client(workbook):
+    """Test client with a logged-in session."""
+    client = app_module.app.test_client()
+    with client.session_transaction() as s: s['user'] = 'admin'
+    return client
@@ -0,0 +1,34 @@
+from collections import Counter
+
+import app as app_module
+
+def test_member_selector_marks_only_that_member(client):
+    ledger = app_module.get_ledger()
+    shared = Counter(m.payment_id for m in ledger.members)
+    member = next(m for m in ledger.members if shared[m.payment_id] > 1)
+    others = [m for m in ledger.members if m.payment_id == member.payment_id and m is not member]
+
+    resp = client.post('/api/bulk-pay', json={'member': member.key})
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert sorted(body['ids']) == sorted(item.id for item in member.items)
+    assert [m['key'] for m in body['members']] == [member.key]
+
+    paid = app_module.PAYMENTS.snapshot()
+    assert all(item.id in paid for item in member.items)
+    assert not any(item.id in paid for m in others for item in m.items)
+
+def test_members_api_exposes_key(client):
+    members = client.get('/api/members?fields=key,payment_id').get_json()['members']
+    keys = [m['key'] for m in members]
+    assert len(set(keys)) == len(keys)
+
+def test_paid_must_be_a_boolean(client):
+    member = app_module.get_ledger().members[0]
+    for paid in ('false', 0, 0.0001, None, []):
+        resp = client.post('/api/bulk-pay', json={'member': member.key, 'paid': paid})
+        assert resp.status_code == 400, paid
+    assert app_module.PAYMENTS.snapshot() == {}
+
+    resp = client.post('/api/bulk-pay', json={'member': member.key, 'paid': False})
+    assert resp.status_code == 200 and resp.get_json()['changed'] == 0
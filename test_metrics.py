@@ -0,0 +1,19 @@
+import app as app_module
+
+def test_label_values_are_escaped():
+    metrics = app_module.Metrics()
+    metrics.describe('demo_total', 'counter', 'Demo.')
+    metrics.inc('demo_total', (('route', 'a\\b"c\nd'),))
+    assert 'demo_total{route="a\\\\b\\"c\\nd"} 1' in metrics.render().splitlines()
+
+def test_metrics_needs_login_or_token(workbook, monkeypatch):
+    client = app_module.app.test_client()
+    assert client.get('/metrics').status_code == 401
+
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    resp = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert resp.status_code == 200 and '# TYPE chitfund_request_seconds histogram' in resp.get_data(as_text=True)
+
+    with client.session_transaction() as s: s['user'] = 'admin'
+    assert client.get('/metrics').status_code == 200
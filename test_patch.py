@@ -0,0 +1,166 @@
+import zipfile
+
+import openpyxl
+import pytest
+
+import app as app_module
+
+def _sheet(client):
+    return client.get('/api/sheets').get_json()['sheets'][0]
+
+def _version(client, sheet):
+    return client.get(f'/api/sheet_data?sheet={sheet}&rows=1').get_json()['version']
+
+def test_patch_rejects_illegal_xml_characters(client, workbook):
+    sheet = _sheet(client)
+    before = open(workbook, 'rb').read()
+    resp = client.post('/api/patch_sheet_data', json={
+        'sheet_name': sheet, 'version': _version(client, sheet),
+        'changes': [{'row': 0, 'col': 0, 'new': 'note\u0001x'}]})
+    assert resp.status_code == 400
+    assert resp.get_json()['cells'] == [{'row': 0, 'col': 0}]
+    assert open(workbook, 'rb').read() == before
+    assert client.get('/api/members').get_json()['members']
+
+@pytest.mark.parametrize('fresh', [True, False]) # Splice and openpyxl paths
+def test_patch_rejects_non_scalar_values(client, workbook, fresh):
+    sheet = _sheet(client)
+    before = open(workbook, 'rb').read()
+    resp = client.post('/api/patch_sheet_data', json={
+        'sheet_name': sheet, 'version': _version(client, sheet) if fresh else 'stale',
+        'changes': [{'row': 0, 'col': 0, 'new': 'ok'}, {'row': 1, 'col': 0, 'new': ['a']},
+                    {'row': 2, 'col': 0, 'new': {'a': 1}}]})
+    assert resp.status_code == 400
+    assert resp.get_json()['cells'] == [{'row': 1, 'col': 0}, {'row': 2, 'col': 0}]
+    assert open(workbook, 'rb').read() == before
+
+def test_splice_never_writes_malformed_xml(workbook):
+    sheet = app_module.get_all_sheet_names()[0]
+    before = open(workbook, 'rb').read()
+    with pytest.raises(app_module._PatchUnsupported):
+        app_module._splice_patch(sheet, {(1, 1): 'note\u0001x'})
+    assert open(workbook, 'rb').read() == before
+    openpyxl.load_workbook(workbook).close()
+
+def _post(client, sheet, version, changes):
+    return client.post('/api/patch_sheet_data', json={'sheet_name': sheet, 'version': version, 'changes': changes})
+
+def test_stale_version_applies_matching_cells_and_reports_conflicts(client, workbook, monkeypatch):
+    sheet = _sheet(client)
+    current = app_module._editor_text(openpyxl.load_workbook(workbook)[sheet].cell(1, 1).value)
+    monkeypatch.setattr(app_module, '_splice_patch', lambda *a: pytest.fail('stale patch was spliced'))
+    resp = _post(client, sheet, 'stale', [
+        {'row': 0, 'col': 0, 'old': current + 'x', 'new': 'mine'},
+        {'row': 700, 'col': 1, 'old': '', 'new': 'added'}])
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert body['applied'] == 1
+    assert body['conflicts'] == [{'row': 0, 'col': 0, 'old': current + 'x', 'new': 'mine', 'current': current}]
+    assert body['version'] == _version(client, sheet)
+    ws = openpyxl.load_workbook(workbook)[sheet]
+    assert app_module._editor_text(ws.cell(1, 1).value) == current
+    assert ws.cell(701, 2).value == 'added'
+
+def test_fresh_version_is_spliced(client, workbook, monkeypatch):
+    sheet = _sheet(client)
+    monkeypatch.setattr(app_module, '_openpyxl_patch', lambda *a: pytest.fail('fresh patch went through openpyxl'))
+    resp = _post(client, sheet, _version(client, sheet), [
+        {'row': 700, 'col': 1, 'new': ' padded '}, {'row': 700, 'col': 2, 'new': '42'}])
+    assert resp.get_json()['conflicts'] == []
+    ws = openpyxl.load_workbook(workbook)[sheet]
+    assert ws.cell(701, 2).value == ' padded ' and ws.cell(701, 3).value == 42
+    assert ws.dimensions.endswith('701')
+
+def _save_workbook(path, cells):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'feb2026'
+    for coord, value in cells.items(): ws[coord] = value
+    wb.save(path)
+    return ws.title
+
+def _use_shared_strings(path, cells):
+    """Rewrites the given {coord: text} inline strings of the first sheet as a
+    sharedStrings part, the way Excel saves them. Returns the new part."""
+    with zipfile.ZipFile(path) as z: parts = {i.filename: z.read(i) for i in z.infolist()}
+    strings = list(dict.fromkeys(cells.values()))
+    sheet = parts['xl/worksheets/sheet1.xml']
+    for coord, text in cells.items():
+        sheet = sheet.replace(f'<c r="{coord}" t="inlineStr"><is><t>{text}</t></is></c>'.encode(),
+                              f'<c r="{coord}" t="s"><v>{strings.index(text)}</v></c>'.encode())
+    parts['xl/worksheets/sheet1.xml'] = sheet
+    parts['xl/sharedStrings.xml'] = (
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        + ''.join(f'<si><t>{text}</t></si>' for text in strings) + '</sst>').encode()
+    parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(b'</Relationships>',
+        b'<Relationship Id="rIdSst" Target="sharedStrings.xml" '
+        b'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>')
+    parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(b'</Types>',
+        b'<Override PartName="/xl/sharedStrings.xml" '
+        b'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, data in parts.items(): z.writestr(name, data)
+    return parts['xl/sharedStrings.xml']
+
+def test_splice_keeps_shared_strings(workbook):
+    cells = {'A1': 'alpha', 'B1': 'beta', 'A2': 'alpha'}
+    sheet = _save_workbook(workbook, cells)
+    shared = _use_shared_strings(workbook, cells)
+    with zipfile.ZipFile(workbook) as z: assert b'inlineStr' not in z.read('xl/worksheets/sheet1.xml')
+    app_module._splice_patch(sheet, {(1, 1): 'gamma', (2, 2): 'beta'})
+
+    with zipfile.ZipFile(workbook) as z: assert z.read('xl/sharedStrings.xml') == shared
+    ws = openpyxl.load_workbook(workbook)[sheet]
+    assert [[c.value for c in row] for row in ws.iter_rows()] == [['gamma', 'beta'], ['alpha', 'beta']]
+
+def test_splice_writes_formulas_and_drops_stale_results(workbook):
+    sheet = _save_workbook(workbook, {'A1': 1, 'B1': '=A1*2'})
+    app_module._splice_patch(sheet, {(1, 1): 5, (1, 3): '=B1+1'})
+    ws = openpyxl.load_workbook(workbook)[sheet]
+    assert [c.value for c in ws[1]] == [5, '=A1*2', '=B1+1']
+
+    xml = (b'<worksheet><sheetData><row r="1"><c r="A1"><v>1</v></c><c r="B1"><f>A1*2</f><v>2</v></c>'
+           b'</row></sheetData></worksheet>')
+    patched = app_module._patch_sheet_xml(xml, {(1, 1): 3})
+    assert b'<c r="B1"><f>A1*2</f></c>' in patched and b'<v>2</v>' not in patched
+
+def test_splice_refuses_shared_formula_masters():
+    xml = (b'<worksheet><sheetData><row r="1"><c r="A1"><f t="shared" ref="A1:A3" si="0">B1</f><v>0</v></c>'
+           b'</row></sheetData></worksheet>')
+    with pytest.raises(app_module._PatchUnsupported):
+        app_module._patch_sheet_xml(xml, {(1, 1): 'x'})
+
+def test_unauthenticated_patch_does_not_wait_for_the_workbook(workbook):
+    # While the startup download is pending, writers block; anonymous requests must not queue
+    app_module.WORKBOOK_READY.clear()
+    try:
+        resp = app_module.app.test_client().post('/api/patch_sheet_data', json={'sheet_name': 'x', 'changes': []})
+        assert resp.status_code == 401
+    finally:
+        app_module.WORKBOOK_READY.set()
+
+def test_sheet_window_rejects_bad_numbers_without_echoing_them(client):
+    sheet = _sheet(client)
+    for query in ('start_row=<script>', 'rows=-1'):
+        resp = client.get(f'/api/sheet_data?sheet={sheet}&{query}')
+        assert resp.status_code == 400
+        assert resp.get_json() == {'error': app_module._WINDOW_ARG_ERROR}
+
+def test_sheet_data_closes_workbook_when_body_is_not_read(client, monkeypatch):
+    sheet = _sheet(client)
+    opened = []
+    load_workbook = openpyxl.load_workbook
+    def spy(*args, **kwargs):
+        wb = load_workbook(*args, **kwargs)
+        opened.append(wb)
+        return wb
+    monkeypatch.setattr(app_module.openpyxl, 'load_workbook', spy)
+
+    # The server closes every response it was handed, whether or not it sent the body
+    resp = client.head(f'/api/sheet_data?sheet={sheet}', buffered=False)
+    assert resp.status_code == 200
+    resp.close()
+    resp = client.get(f'/api/sheet_data?sheet={sheet}', buffered=False)
+    resp.close() # Client went away before reading the body
+    assert len(opened) == 2
+    assert all(wb._archive.fp is None for wb in opened)
@@ -0,0 +1,108 @@
+import json
+import multiprocessing
+import time
+
+import app as app_module
+
+def _store(tmp_path, **kwargs):
+    return app_module.PaymentStore(str(tmp_path / 'paid.json'), str(tmp_path / 'paid.log'),
+                                   lock_path=str(tmp_path / 'paid.lock'), **kwargs)
+
+def _write_in_child(root, item_ids, compact):
+    # Runs in a separate process: its own store on the same files
+    from pathlib import Path
+    store = _store(Path(root))
+    store.set_many(item_ids, '2026-01-05')
+    if compact: store.compact()
+
+def _run_child(tmp_path, item_ids, compact=False):
+    proc = multiprocessing.get_context('spawn').Process(
+        target=_write_in_child, args=(str(tmp_path), item_ids, compact))
+    proc.start()
+    proc.join(60)
+    assert proc.exitcode == 0
+
+def test_append_writes_one_record_per_change(tmp_path):
+    store = _store(tmp_path)
+    seen = []
+    store.listeners.append(lambda changes, version: seen.append((changes, version)))
+    store.set('a', '2026-01-01')
+    assert store.toggle('a', '2026-01-02') is None
+    assert store.set_many(['a', 'b', 'b'], '2026-01-03') == ['a', 'b']
+    assert store.set_many(['a'], '2026-01-04') == [] # Already paid: no record, date kept
+
+    lines = [json.loads(l) for l in open(tmp_path / 'paid.log')]
+    assert lines == [{'id': 'a', 'paid': '2026-01-01'}, {'id': 'a', 'paid': None},
+                     {'ids': ['a', 'b'], 'paid': '2026-01-03'}]
+    assert store.snapshot() == {'a': '2026-01-03', 'b': '2026-01-03'}
+    assert [v for _, v in seen] == [1, 2, 3]
+    assert seen[-1][0] == {'a': '2026-01-03', 'b': '2026-01-03'}
+
+def test_reload_replays_journal_and_skips_torn_record(tmp_path):
+    store = _store(tmp_path)
+    store.set_many(['a', 'b'], '2026-01-01')
+    store.set('b', None)
+    with open(tmp_path / 'paid.log', 'ab') as f: f.write(b'{"id": "c", "pa')
+    assert _store(tmp_path).snapshot() == {'a': '2026-01-01'}
+
+    # The next append starts on a fresh line, so the torn record can't swallow it
+    store.set('d', '2026-01-02')
+    assert _store(tmp_path).snapshot() == {'a': '2026-01-01', 'd': '2026-01-02'}
+
+def test_tail_picks_up_records_from_another_process(tmp_path):
+    store = _store(tmp_path)
+    seen = []
+    store.listeners.append(lambda changes, version: seen.append(changes))
+    store.set('a', '2026-01-01')
+    token = store.token()
+
+    _run_child(tmp_path, ['b', 'c'])
+    assert store.snapshot() == {'a': '2026-01-01', 'b': '2026-01-05', 'c': '2026-01-05'}
+    assert seen[-1] == {'b': '2026-01-05', 'c': '2026-01-05'}
+    assert store.token() != token
+    assert store.token() == _store(tmp_path).token()
+
+def test_compaction_in_another_process_is_reloaded(tmp_path):
+    store = _store(tmp_path)
+    store.set('a', '2026-01-01')
+    version = store.version
+
+    _run_child(tmp_path, ['b'], compact=True)
+    assert json.load(open(tmp_path / 'paid.json')) == {'a': '2026-01-01', 'b': '2026-01-05'}
+    assert open(tmp_path / 'paid.log', 'rb').read() == b''
+    assert store.snapshot() == {'a': '2026-01-01', 'b': '2026-01-05'}
+    assert store.version > version
+
+    # Appends after the reload land in the new journal and survive a restart
+    store.set('a', None)
+    assert _store(tmp_path).snapshot() == {'b': '2026-01-05'}
+
+def test_compaction_carries_over_records_appended_meanwhile(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    store.set_many(['a', 'b'], '2026-01-01')
+    other = _store(tmp_path)
+
+    # Another process appends while this one writes the snapshot
+    real_dump = json.dump
+    def dump_then_append(data, f, **kwargs):
+        real_dump(data, f, **kwargs)
+        other.set('c', '2026-01-02')
+    monkeypatch.setattr(json, 'dump', dump_then_append)
+    store.compact()
+    monkeypatch.undo()
+
+    assert json.load(open(tmp_path / 'paid.json')) == {'a': '2026-01-01', 'b': '2026-01-01'}
+    assert [json.loads(l) for l in open(tmp_path / 'paid.log')] == [{'id': 'c', 'paid': '2026-01-02'}]
+    expected = {'a': '2026-01-01', 'b': '2026-01-01', 'c': '2026-01-02'}
+    assert store.snapshot() == expected
+    assert other.snapshot() == expected
+    assert _store(tmp_path).snapshot() == expected
+
+def test_background_compaction_after_threshold(tmp_path):
+    store = _store(tmp_path, compact_after=3)
+    for i in range(3): store.set(f'i{i}', '2026-01-01')
+    deadline = time.monotonic() + 10
+    while store._compacting and time.monotonic() < deadline: time.sleep(0.01)
+    assert not store._compacting
+    assert len(json.load(open(tmp_path / 'paid.json'))) == 3
+    assert _store(tmp_path).snapshot() == store.snapshot()
@@ -0,0 +1,40 @@
+import json
+
+import openpyxl
+import pytest
+
+import app as app_module
+
+@pytest.fixture
+def months(workbook):
+    """The sample workbook with its sheet copied into two more months."""
+    wb = openpyxl.load_workbook(workbook)
+    for name in ('feb2026', 'jan2026'): wb.copy_worksheet(wb.worksheets[0]).title = name
+    wb.save(workbook)
+    return app_module.get_all_sheet_names()
+
+def _parse_all(sheets):
+    app_module.LEDGER_CACHE.invalidate()
+    ledgers, parsed = app_module.load_ledgers(sheets)
+    assert parsed == len(sheets)
+    return {name: json.dumps(ledger.to_dict(), sort_keys=True) for name, ledger in ledgers.items()}
+
+def test_report_pool_matches_in_process_parse(months, monkeypatch):
+    sheets = months
+    monkeypatch.setattr(app_module, 'REPORT_WORKERS', 1)
+    expected = _parse_all(sheets)
+    monkeypatch.setattr(app_module, 'REPORT_WORKERS', 2)
+    try:
+        assert _parse_all(sheets) == expected
+        assert app_module._report_pool is not None
+    finally:
+        app_module._reset_report_pool(kill=True)
+
+def test_report_pool_timeout_falls_back_in_process(months, monkeypatch):
+    sheets = months
+    monkeypatch.setattr(app_module, 'REPORT_WORKERS', 1)
+    expected = _parse_all(sheets)
+    monkeypatch.setattr(app_module, 'REPORT_WORKERS', 2)
+    monkeypatch.setattr(app_module, 'REPORT_PARSE_TIMEOUT', 0)
+    assert _parse_all(sheets) == expected
+    assert app_module._report_pool is None
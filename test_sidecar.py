@@ -0,0 +1,38 @@
+import os
+
+import openpyxl
+
+import app as app_module
+
+def _sheet_and_fingerprint():
+    entry = app_module.get_workbook_meta()['sheets'][0]
+    return entry['name'], entry['fingerprint']
+
+def test_save_during_read_is_not_filed_under_old_fingerprint(workbook, monkeypatch):
+    sheet, old = _sheet_and_fingerprint()
+    get_meta = app_module.get_workbook_meta
+    stale_meta = get_meta()
+
+    wb = openpyxl.load_workbook(workbook)
+    wb[sheet].cell(1, 1).value = 'saved meanwhile'
+    app_module.save_workbook(wb)
+    # The read looked the sheet up just before the save landed
+    monkeypatch.setattr(app_module, 'get_workbook_meta', lambda: stale_meta)
+
+    assert app_module.read_sheet_text(sheet).cell(0, 0) == 'saved meanwhile'
+    assert not os.path.exists(app_module._sidecar_path(sheet, old))
+    monkeypatch.setattr(app_module, 'get_workbook_meta', get_meta)
+    _, new = _sheet_and_fingerprint()
+    assert new != old
+    assert app_module._read_sidecar(app_module._sidecar_path(sheet, new)).cell(0, 0) == 'saved meanwhile'
+
+def test_sidecar_outlives_its_replacement(workbook):
+    sheet, fingerprint = _sheet_and_fingerprint()
+    expected = app_module.read_sheet_text(sheet) # Also writes the sidecar
+    path = app_module._sidecar_path(sheet, fingerprint)
+    text = app_module._read_sidecar(path)
+
+    # A newer sidecar of the same sheet removes this one before the reader touches a column
+    app_module._write_sidecar(app_module._sidecar_path(sheet, 'newer'), expected)
+    assert not os.path.exists(path)
+    for c in range(text.shape[1]): assert list(text.column(c)) == list(expected.column(c))
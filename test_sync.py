@@ -0,0 +1,97 @@
+import time
+
+import app as app_module
+
+class FlakyStorage(app_module.LocalStorage):
+    """LocalStorage whose first `failures` uploads raise."""
+    def __init__(self, root, failures=0):
+        super().__init__(root)
+        self.failures = failures
+        self.attempts = []
+
+    def upload(self, name, data):
+        self.attempts.append(time.monotonic())
+        if len(self.attempts) <= self.failures: raise OSError('bucket unavailable')
+        super().upload(name, data)
+
+def _wait(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.02)
+    return True
+
+def test_local_storage_round_trip(tmp_path):
+    storage = app_module.LocalStorage(str(tmp_path / 'bucket'))
+    assert storage.download('data.xlsx') is None and storage.etag('data.xlsx') is None
+    storage.upload('data.xlsx', b'contents')
+    assert storage.download('data.xlsx') == b'contents'
+    assert storage.etag('data.xlsx') == app_module._file_md5(str(tmp_path / 'bucket' / 'data.xlsx'))
+
+def test_burst_of_requests_is_one_upload(workbook, tmp_path):
+    storage = FlakyStorage(str(tmp_path / 'bucket'))
+    worker = app_module.SyncWorker(storage, debounce=0.2)
+    for _ in range(5): worker.request()
+    assert _wait(lambda: worker.state['uploads'] == 1)
+    time.sleep(0.4)
+    assert len(storage.attempts) == 1
+    assert worker.state['coalesced'] == 4
+    assert not worker.status()['pending']
+    assert storage.download(app_module.REMOTE_FILE) == open(workbook, 'rb').read()
+
+def test_failed_upload_is_retried_with_backoff(workbook, tmp_path):
+    storage = FlakyStorage(str(tmp_path / 'bucket'), failures=2)
+    worker = app_module.SyncWorker(storage, debounce=0)
+    worker.request()
+    assert _wait(lambda: worker.state['uploads'] == 1)
+    assert worker.state['failures'] == 2 and worker.state['last_error'] == 'bucket unavailable'
+    first, second, third = storage.attempts
+    # Backoff doubles: 1s after the first failure, 2s after the second
+    assert second - first >= 0.9 and third - second >= 1.9
+    assert worker.status()['retry_in'] is None
+    assert storage.download(app_module.REMOTE_FILE) == open(workbook, 'rb').read()
+
+def test_flush_uploads_without_waiting_for_debounce(workbook, tmp_path):
+    storage = FlakyStorage(str(tmp_path / 'bucket'))
+    worker = app_module.SyncWorker(storage, debounce=60)
+    worker.request()
+    assert worker.status()['pending']
+    started = time.monotonic()
+    assert worker.flush(timeout=5)
+    assert time.monotonic() - started < 5
+    assert worker.state['uploads'] == 1 and not worker.status()['pending']
+    assert storage.download(app_module.REMOTE_FILE) == open(workbook, 'rb').read()
+
+def test_flush_gives_up_while_uploads_fail(workbook, tmp_path):
+    storage = FlakyStorage(str(tmp_path / 'bucket'), failures=100)
+    worker = app_module.SyncWorker(storage, debounce=60)
+    worker.request()
+    assert not worker.flush(timeout=0.5)
+    assert worker.state['uploads'] == 0 and worker.state['failures'] >= 1
+    assert worker.status()['pending']
+
+class BrokenStorage(app_module.LocalStorage):
+    def download(self, name): raise OSError('bucket unavailable')
+
+def _hydrate(monkeypatch, storage):
+    monkeypatch.setattr(app_module, 'STORAGE', storage)
+    monkeypatch.setattr(app_module, 'USE_CLOUD_STORAGE', True)
+    monkeypatch.setattr(app_module, 'PREWARM_IMPORTS', False)
+    monkeypatch.setattr(app_module, 'STARTUP', dict(app_module.STARTUP, hydration='pending'))
+    app_module.WORKBOOK_READY.clear()
+    app_module._startup()
+    assert app_module.WORKBOOK_READY.is_set()
+    return app_module.STARTUP['hydration']
+
+def test_hydration_downloads_then_finds_copy_unchanged(workbook, tmp_path, monkeypatch):
+    storage = app_module.LocalStorage(str(tmp_path / 'bucket'))
+    storage.upload(app_module.REMOTE_FILE, b'remote workbook')
+    assert _hydrate(monkeypatch, storage) == 'downloaded'
+    assert open(workbook, 'rb').read() == b'remote workbook'
+    assert _hydrate(monkeypatch, storage) == 'unchanged'
+
+def test_hydration_failure_is_reported_and_logged(workbook, tmp_path, monkeypatch, caplog):
+    before = open(workbook, 'rb').read()
+    assert _hydrate(monkeypatch, BrokenStorage(str(tmp_path / 'bucket'))) == 'failed'
+    assert open(workbook, 'rb').read() == before
+    assert any(r.exc_info and 'bucket unavailable' in str(r.exc_info[1]) for r in caplog.records)